@@ -0,0 +1,112 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value, prefetch_related_objects
+
+from api.catalog import bump_catalog_version, get_catalog_version
+from api.replicas import from_primary, primary
+from api.serializers import RecipeGetSerializer
+from api.utils import get_recipe_prefetch
+from recipe.models import Recipe
+
+USER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def recipe_version_key(recipe_id):
+    return f'recipe:{recipe_id}:version'
+
+
+def author_version_key(author_id):
+    return f'author:{author_id}:version'
+
+
+def bump_version(key):
+    """Новая версия делает недоступными все записи со старой.
+
+    Версия сдвигается после фиксации транзакции: иначе параллельный
+    промах кэша прочитал бы старые строки и сохранил их под новой
+    версией.
+    """
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def bump_recipe(recipe_id):
+    bump_version(recipe_version_key(recipe_id))
+
+
+def bump_author(author_id):
+    bump_version(author_version_key(author_id))
+
+
+def bump_catalog():
+    bump_catalog_version()
+
+
+def get_versions(keys):
+    """Текущие версии, отсутствующие в кэше создаются заново."""
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        version = time.time_ns()
+        for key in missing:
+            cache.add(key, version, None)
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def get_payload_keys(recipes):
+    version_keys = set()
+    for recipe in recipes:
+        version_keys.add(recipe_version_key(recipe.id))
+        version_keys.add(author_version_key(recipe.author_id))
+    versions = get_versions(list(version_keys))
+    catalog = get_catalog_version()
+    return {
+        recipe.id: (
+            f'recipe:{recipe.id}:'
+            f'{versions[recipe_version_key(recipe.id)]}:'
+            f'{versions[author_version_key(recipe.author_id)]}:{catalog}'
+        )
+        for recipe in recipes
+    }
+
+
+def serialize_recipes(recipes, request):
+    """Представление рецептов из кэша с наложением флагов юзера.
+
+    В кэше хранится независящая от юзера часть RecipeGetSerializer.
+    Флаги is_favorited, is_in_shopping_cart и author.is_subscribed
+    берутся из аннотаций рецептов, посчитанных в запросе страницы.
+    """
+    recipes = list(recipes)
+    keys = get_payload_keys(recipes)
+    cached = cache.get_many(list(keys.values()))
+    missed = [recipe for recipe in recipes if keys[recipe.id] not in cached]
+    if missed:
+        # Заполнение кэша целиком с основной базы: рецепты, их связанные
+        # данные и флаги без запросов на каждый рецепт
+        missed = from_primary(missed, Recipe.objects.annotate(
+            is_favorited=Value(False), is_in_shopping_cart=Value(False)))
+        fresh = {}
+        with primary():
+            prefetch_related_objects(
+                missed, *get_recipe_prefetch(Value(False)))
+            missed_data = RecipeGetSerializer(
+                missed, many=True, context={'request': request}).data
+        for recipe, data in zip(missed, missed_data):
+            for field in USER_FIELDS:
+                data[field] = False
+            fresh[keys[recipe.id]] = data
+        cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+        cached.update(fresh)
+    result = []
+    for recipe in recipes:
+        data = dict(cached[keys[recipe.id]])
+        for field in USER_FIELDS:
+            data[field] = getattr(recipe, field)
+        data['author'] = dict(
+            data['author'], is_subscribed=recipe.author_is_subscribed)
+        result.append(data)
+    return result
@@ -0,0 +1,140 @@
+import gzip
+import os
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework.renderers import JSONRenderer
+
+from api.replicas import primary
+from api.serializers import IngredientSerializer, TagSerializer
+from recipe.models import Ingredient, Tag
+
+GZIP_LEVEL = 6
+
+
+def read_stamp(stamp):
+    try:
+        return int(stamp.read_text())
+    except ValueError:
+        # Пустая метка, созданная touch
+        return stamp.stat().st_mtime_ns
+
+
+def bump_stamp(path):
+    """Запись следующей версии в файл-метку.
+
+    Версия - время в нс, но не меньше прошлой версии + 1, поэтому
+    два сброса подряд не совпадут, даже если время файла одно.
+    Метка заменяется целиком, читатели не видят её пустой.
+    """
+    stamp = Path(path)
+    try:
+        version = read_stamp(stamp) + 1
+    except FileNotFoundError:
+        version = 0
+    version = max(time.time_ns(), version)
+    temporary = stamp.with_name(
+        f'{stamp.name}.{os.getpid()}.{threading.get_ident()}')
+    temporary.write_text(str(version))
+    os.replace(temporary, stamp)
+    return version
+
+
+def get_stamp_version(path):
+    """Версия из файла-метки.
+
+    Метка общая для всех воркеров, поэтому изменение из любого
+    процесса видно сразу.
+    """
+    try:
+        return read_stamp(Path(path))
+    except FileNotFoundError:
+        return bump_stamp(path)
+
+
+def get_catalog_version():
+    """Версия тегов и ингредиентов."""
+    return get_stamp_version(settings.CATALOG_VERSION_STAMP)
+
+
+def bump_catalog_version():
+    """Новая версия справочников после фиксации транзакции.
+
+    Иначе другой воркер собрал бы ответ из старых строк
+    под новой версией.
+    """
+    transaction.on_commit(
+        partial(bump_stamp, settings.CATALOG_VERSION_STAMP))
+
+
+class CatalogPayload:
+    """Готовый ответ со списком справочника.
+
+    Тело сериализуется и сжимается один раз на версию справочников
+    и хранится в памяти процесса.
+    """
+
+    def __init__(self, name, get_queryset, serializer_class):
+        self.name = name
+        self.get_queryset = get_queryset
+        self.serializer_class = serializer_class
+        self.version = None
+
+    def build(self, version):
+        # Собранный ответ живёт до новой версии, поэтому не с реплики
+        with primary():
+            body = JSONRenderer().render(
+                self.serializer_class(self.get_queryset(), many=True).data)
+        self.body = body
+        self.gzipped = gzip.compress(body, GZIP_LEVEL)
+        self.etag = f'"{self.name}-{version}"'
+        # Сжатое тело - другое представление, ему нужен свой ETag
+        self.gzip_etag = f'"{self.name}-{version}-gzip"'
+        self.last_modified = http_date(version // 10 ** 9)
+        self.version = version
+
+    def get(self):
+        version = get_catalog_version()
+        if version != self.version:
+            self.build(version)
+        return self
+
+    def is_not_modified(self, request, etag):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return (if_modified_since is not None
+                and self.version // 10 ** 9 <= if_modified_since)
+
+    def response(self, request):
+        """Ответ 200 со сжатием по Accept-Encoding или 304."""
+        payload = self.get()
+        use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        etag = payload.gzip_etag if use_gzip else payload.etag
+        if payload.is_not_modified(request, etag):
+            response = HttpResponseNotModified()
+        elif use_gzip:
+            response = HttpResponse(
+                payload.gzipped, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                payload.body, content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = payload.last_modified
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+tags_payload = CatalogPayload('tags', Tag.objects.all, TagSerializer)
+ingredients_payload = CatalogPayload(
+    'ingredients', Ingredient.objects.all, IngredientSerializer)
@@ -0,0 +1,133 @@
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from api.catalog import bump_stamp, get_catalog_version, get_stamp_version
+from recipe.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscriptions, User
+
+# Ответ без ETag и Last-Modified
+NO_VALIDATORS = (None, None)
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+USER_STATE_MODELS = {
+    'favorites': Favorite,
+    'shopping_cart': ShoppingCart,
+    'subscriptions': Subscriptions,
+}
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(
+        ':'.join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def get_recipes_version():
+    """Версия всех рецептов для ETag списков."""
+    return get_stamp_version(settings.RECIPES_VERSION_STAMP)
+
+
+def bump_recipes_version():
+    """Новая версия рецептов после фиксации транзакции.
+
+    Иначе параллельный запрос мог бы сохранить у клиента новую
+    версию вместе со старыми данными.
+    """
+    transaction.on_commit(
+        partial(bump_stamp, settings.RECIPES_VERSION_STAMP))
+
+
+def get_user_state(user):
+    """Отпечаток избранного, корзины и подписок юзера одним запросом.
+
+    Записи только добавляются и удаляются, а id не переиспользуются,
+    поэтому любое изменение меняет число записей или максимальный id.
+    """
+    if not user.is_authenticated:
+        return None
+    annotations = {}
+    for name, model in USER_STATE_MODELS.items():
+        related = model.objects.filter(
+            user=OuterRef('pk')).order_by().values('user')
+        annotations[f'{name}_count'] = Subquery(
+            related.annotate(value=Count('id')).values('value'))
+        annotations[f'{name}_max'] = Subquery(
+            related.annotate(value=Max('id')).values('value'))
+    return User.objects.filter(pk=user.pk).annotate(
+        **annotations).values_list(*annotations).first()
+
+
+def is_conditional(request):
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def get_list_validators(request):
+    """ETag списка рецептов без запросов к таблице рецептов.
+
+    Версия рецептов меняется при любом изменении рецептов, их тегов,
+    ингредиентов и данных авторов, поэтому ETag общий для всех
+    фильтров и страниц. Last-Modified не отдаётся: изменение
+    избранного не сдвигает время последнего изменения.
+    Только для чтения с основной базы: реплика может отставать
+    от версии.
+    """
+    etag = make_etag(request.GET.urlencode(), get_recipes_version(),
+                     get_catalog_version(), get_user_state(request.user))
+    return etag, None
+
+
+def get_detail_validators(pk, user):
+    """ETag и Last-Modified рецепта с флагами текущего юзера.
+
+    Возвращает NO_VALIDATORS, если рецепта нет.
+    Last-Modified отдаётся только анониму, у которого нет своих флагов.
+    """
+    try:
+        recipes = Recipe.objects.filter(pk=int(pk))
+    except (TypeError, ValueError):
+        return NO_VALIDATORS
+    fields = ['modified']
+    if user.is_authenticated:
+        recipes = recipes.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscriptions.objects.filter(
+                user=user, author=OuterRef('author')))
+        )
+        fields += ['is_favorited', 'is_in_shopping_cart',
+                   'author_is_subscribed']
+    state = recipes.values_list(*fields).first()
+    if state is None:
+        return NO_VALIDATORS
+    catalog = get_catalog_version()
+    last_modified = None
+    if not user.is_authenticated:
+        last_modified = max(int(state[0].timestamp()), catalog // 10 ** 9)
+    return make_etag(pk, catalog, *state), last_modified
+
+
+def conditional_response(request, validators, get_response):
+    """Ответ 304 по If-None-Match/If-Modified-Since без сериализации.
+
+    get_response вызывается, только если ресурс изменился.
+    """
+    etag, last_modified = validators
+    if etag is None:
+        return get_response()
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
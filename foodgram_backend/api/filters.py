@@ -2,6 +2,7 @@ import django_filters
 from django_filters.rest_framework import filters
 
 from recipe.models import Ingredient, Recipe, Tag
+from recipe.search import search_recipes
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -15,6 +16,7 @@ class RecipeFilter(django_filters.FilterSet):
         queryset=Tag.objects.all()
     )
     id = django_filters.CharFilter(field_name='id')
+    search = filters.CharFilter(method='filter_by_search')
 
     def filter_by_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -30,6 +32,9 @@ class RecipeFilter(django_filters.FilterSet):
             )
         return queryset
 
+    def filter_by_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
@@ -0,0 +1,247 @@
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+# Границы корзин гистограммы времени ответа, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Значения записи: запросы, ошибки 5xx, сумма времени, SQL-запросы,
+# время SQL, затем счётчики корзин и корзина +Inf
+REQUESTS, ERRORS, SECONDS, QUERIES, SQL_SECONDS, BUCKETS = range(6)
+VALUES_COUNT = BUCKETS + len(LATENCY_BUCKETS) + 1
+KEY_SIZE = 256
+KEY_SEPARATOR = '\x1f'
+HEADER = struct.Struct('<Q')
+RECORD = struct.Struct(f'<{KEY_SIZE}s{VALUES_COUNT}d')
+VALUES = struct.Struct(f'<{VALUES_COUNT}d')
+INITIAL_SIZE = 64 * 1024
+FILE_SUFFIX = '.metrics'
+# Счётчики завершившихся воркеров, пишет только мастер gunicorn
+ARCHIVE_NAME = 'archive'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def read_records(data):
+    """Записи (ключ, значения) из содержимого файла метрик."""
+    if len(data) < HEADER.size:
+        return
+    used = min(HEADER.unpack_from(data)[0], len(data))
+    for offset in range(HEADER.size, used - RECORD.size + 1, RECORD.size):
+        key, *values = RECORD.unpack_from(data, offset)
+        yield key.rstrip(b'\0').decode(errors='ignore'), values
+
+
+class MetricsFile:
+    """Счётчики одного процесса в отображённом в память файле.
+
+    Каждый воркер пишет только в свой файл, поэтому блокировки между
+    процессами не нужны; /metrics суммирует файлы всех воркеров.
+    Без каталога используется анонимная память процесса.
+    """
+
+    def __init__(self, directory=None, name=None):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.offsets = {}
+        self.path = None
+        self.file = None
+        size = INITIAL_SIZE
+        if directory:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            self.path = Path(directory) / f'{name or self.pid}{FILE_SUFFIX}'
+            # Файл завершившегося процесса с тем же pid продолжается
+            self.file = open(self.path, 'a+b')
+            size = max(os.fstat(self.file.fileno()).st_size, size)
+            self.file.truncate(size)
+        self.map(size)
+        if HEADER.unpack_from(self.buffer)[0] < HEADER.size:
+            HEADER.pack_into(self.buffer, 0, HEADER.size)
+        for number, (key, _) in enumerate(read_records(self.buffer)):
+            self.offsets[key] = HEADER.size + number * RECORD.size
+
+    def map(self, size):
+        if self.file is None:
+            self.buffer = mmap.mmap(-1, size)
+        else:
+            self.buffer = mmap.mmap(self.file.fileno(), size)
+
+    def grow(self):
+        size = len(self.buffer) * 2
+        if self.file is None:
+            data = self.buffer[:]
+            self.buffer.close()
+            self.map(size)
+            self.buffer[:len(data)] = data
+        else:
+            self.buffer.close()
+            self.file.truncate(size)
+            self.map(size)
+
+    def offset(self, key):
+        offset = self.offsets.get(key)
+        if offset is None:
+            offset = HEADER.unpack_from(self.buffer)[0]
+            if offset + RECORD.size > len(self.buffer):
+                self.grow()
+            RECORD.pack_into(self.buffer, offset, key.encode()[:KEY_SIZE],
+                             *[0.0] * VALUES_COUNT)
+            # Длина меняется после записи, читатели не видят неполных записей
+            HEADER.pack_into(self.buffer, 0, offset + RECORD.size)
+            self.offsets[key] = offset
+        return offset + KEY_SIZE
+
+    def add(self, key, increments):
+        """Прибавление {номер значения: приращение} к записи ключа."""
+        with self.lock:
+            offset = self.offset(key)
+            values = list(VALUES.unpack_from(self.buffer, offset))
+            for index, increment in increments.items():
+                values[index] += increment
+            VALUES.pack_into(self.buffer, offset, *values)
+
+    def read(self):
+        return self.buffer[:]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Файл метрик текущего процесса, заново после fork воркера."""
+    global _store
+    if _store is None or _store.pid != os.getpid():
+        with _store_lock:
+            if _store is None or _store.pid != os.getpid():
+                _store = MetricsFile(settings.METRICS_DIR or None)
+    return _store
+
+
+def clear_metrics_dir(directory):
+    """Удаление файлов метрик прошлого запуска сервиса."""
+    for path in Path(directory).glob(f'*{FILE_SUFFIX}'):
+        path.unlink()
+
+
+def archive_worker(directory, pid):
+    """Перенос счётчиков завершившегося воркера в общий файл.
+
+    Счётчики не уменьшаются, а число файлов не растёт при перезапуске
+    воркеров gunicorn.
+    """
+    path = Path(directory) / f'{pid}{FILE_SUFFIX}'
+    if not path.exists():
+        return
+    archive = MetricsFile(directory, ARCHIVE_NAME)
+    for key, values in read_records(path.read_bytes()):
+        archive.add(key, dict(enumerate(values)))
+    archive.buffer.flush()
+    path.unlink()
+
+
+def observe(route, action, method, status, seconds, queries, sql_seconds):
+    """Учёт одного запроса."""
+    bucket = next(
+        (index for index, bound in enumerate(LATENCY_BUCKETS)
+         if seconds <= bound),
+        len(LATENCY_BUCKETS)
+    )
+    get_store().add(
+        KEY_SEPARATOR.join((route, action, method)),
+        {
+            REQUESTS: 1,
+            ERRORS: int(status >= 500),
+            SECONDS: seconds,
+            QUERIES: queries,
+            SQL_SECONDS: sql_seconds,
+            BUCKETS + bucket: 1,
+        }
+    )
+
+
+def collect():
+    """Сумма значений по всем процессам, {ключ: значения}."""
+    store = get_store()
+    if store.path is None:
+        sources = [store.read()]
+    else:
+        sources = [
+            path.read_bytes()
+            for path in store.path.parent.glob(f'*{FILE_SUFFIX}')
+        ]
+    totals = {}
+    for data in sources:
+        for key, values in read_records(data):
+            if key in totals:
+                totals[key] = [a + b for a, b in zip(totals[key], values)]
+            else:
+                totals[key] = values
+    return totals
+
+
+def escape(value):
+    return (value.replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def format_number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def export():
+    """Метрики в текстовом формате Prometheus."""
+    series = sorted(collect().items())
+    lines = []
+
+    def metric(name, kind, help_text, rows):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(rows)
+
+    def labels(key, **extra):
+        route, action, method = (key.split(KEY_SEPARATOR) + ['', ''])[:3]
+        pairs = dict(route=route, action=action, method=method, **extra)
+        return ','.join(
+            f'{name}="{escape(value)}"' for name, value in pairs.items())
+
+    def counter(name, index, help_text):
+        metric(name, 'counter', help_text, [
+            f'{name}{{{labels(key)}}} {format_number(values[index])}'
+            for key, values in series
+        ])
+
+    counter('foodgram_http_requests_total', REQUESTS,
+            'Количество запросов.')
+    counter('foodgram_http_request_errors_total', ERRORS,
+            'Количество ответов со статусом 5xx.')
+    rows = []
+    name = 'foodgram_http_request_duration_seconds'
+    for key, values in series:
+        total = 0
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            total += values[BUCKETS + index]
+            rows.append(f'{name}_bucket{{{labels(key, le=str(bound))}}} '
+                        f'{format_number(total)}')
+        rows.append(f'{name}_bucket{{{labels(key, le="+Inf")}}} '
+                    f'{format_number(values[REQUESTS])}')
+        rows.append(f'{name}_sum{{{labels(key)}}} '
+                    f'{format_number(values[SECONDS])}')
+        rows.append(f'{name}_count{{{labels(key)}}} '
+                    f'{format_number(values[REQUESTS])}')
+    metric(name, 'histogram', 'Время ответа.', rows)
+    counter('foodgram_db_queries_total', QUERIES,
+            'Количество SQL-запросов.')
+    counter('foodgram_db_query_duration_seconds_total', SQL_SECONDS,
+            'Суммарное время SQL-запросов.')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Эндпоинт для Prometheus."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(export(), content_type=CONTENT_TYPE)
@@ -0,0 +1,77 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+# Метка для запросов, не совпавших ни с одним маршрутом
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class QueryTimer:
+    """Обёртка выполнения SQL: число и время запросов, лог медленных."""
+
+    def __init__(self, request):
+        self.request = request
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if (settings.SLOW_QUERY_MS
+                    and elapsed * 1000 >= settings.SLOW_QUERY_MS):
+                logger.warning(
+                    'Медленный запрос %.1f мс, %s %s: %s',
+                    elapsed * 1000, self.request.method,
+                    self.request.path, sql
+                )
+
+
+def get_route(request):
+    """Имя маршрута и действие вьюсета, например recipe-list и list."""
+    match = request.resolver_match
+    if match is None:
+        return UNMATCHED_ROUTE, ''
+    actions = getattr(match.func, 'actions', None) or {}
+    return (match.view_name or match.route,
+            actions.get(request.method.lower(), ''))
+
+
+class MetricsMiddleware:
+    """Время ответа и SQL-запросы по маршрутам для /metrics.
+
+    Запросы, выполненные при отдаче потокового ответа, уже после
+    выхода из middleware, не учитываются.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED and not settings.SLOW_QUERY_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer(request)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        if settings.METRICS_ENABLED:
+            route, action = get_route(request)
+            metrics.observe(
+                route, action, request.method, response.status_code,
+                time.perf_counter() - started, timer.count, timer.seconds
+            )
+        return response
@@ -0,0 +1,150 @@
+import logging
+import os
+import re
+import threading
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+from api import middleware
+
+logger = logging.getLogger(__name__)
+
+LOG, RAISE = 'log', 'raise'
+# Кадров стека вызова в отчёте
+STACK_LIMIT = 6
+# Обёртки запросов, которые не относятся к месту вызова
+IGNORED_FILES = {__file__, middleware.__file__}
+DB_FRAMES = os.path.join('django', 'db', '')
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+SPACES = re.compile(r'\s+')
+
+_state = threading.local()
+_original_data = serializers.BaseSerializer.data
+_original_readable_fields = serializers.Serializer._readable_fields
+
+
+class NPlusOneError(AssertionError):
+    """Повторяющиеся запросы в одном проходе сериализатора."""
+
+
+def fingerprint(sql):
+    """Текст запроса без различий в пробелах и длине списков IN."""
+    return IN_LIST.sub('(%s, ...)', SPACES.sub(' ', sql).strip())
+
+
+def get_call_site():
+    """Кадры стека из кода проекта, а если их нет - из DRF."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename not in IGNORED_FILES
+        and DB_FRAMES not in frame.filename
+    ]
+    own_frames = [
+        frame for frame in frames
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(
+        (own_frames or frames)[-STACK_LIMIT:]))
+
+
+class SerializerPass:
+    """Запросы одного прохода сериализатора по полям, где они выполнены."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.fields = []
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        path = ' > '.join(self.fields) or '<root>'
+        query = self.queries.setdefault(
+            (path, fingerprint(sql)), {'params': set(), 'call_site': None})
+        query['params'].add(repr(params))
+        if (query['call_site'] is None
+                and len(query['params']) >= self.threshold):
+            query['call_site'] = get_call_site()
+        return execute(sql, params, many, context)
+
+    def problems(self):
+        return [
+            (path, sql, len(query['params']), query['call_site'])
+            for (path, sql), query in self.queries.items()
+            if len(query['params']) >= self.threshold
+        ]
+
+
+def report(serializer, problems):
+    lines = [f'N+1 в {type(serializer).__name__}:']
+    for path, sql, count, call_site in problems:
+        lines.append(
+            f'поле {path}: {count} одинаковых запросов с разными '
+            f'параметрами\n  {sql}\n{call_site}'.rstrip())
+    return '\n'.join(lines)
+
+
+def get_mode():
+    return getattr(_state, 'mode', None) or settings.NPLUSONE_DETECTION
+
+
+def data(self):
+    """BaseSerializer.data с учётом запросов корневого сериализатора."""
+    mode = get_mode()
+    if not mode or getattr(_state, 'current', None) is not None:
+        return _original_data.fget(self)
+    current = _state.current = SerializerPass(settings.NPLUSONE_THRESHOLD)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(current))
+            result = _original_data.fget(self)
+    finally:
+        _state.current = None
+    problems = current.problems()
+    if problems:
+        message = report(self, problems)
+        if mode == RAISE:
+            raise NPlusOneError(message)
+        logger.warning(message)
+    return result
+
+
+def _readable_fields(self):
+    """Поля сериализатора с отметкой, какое поле сейчас выводится."""
+    current = getattr(_state, 'current', None)
+    for field in _original_readable_fields.fget(self):
+        if current is None:
+            yield field
+            continue
+        current.fields.append(f'{type(self).__name__}.{field.field_name}')
+        try:
+            yield field
+        finally:
+            current.fields.pop()
+
+
+def install():
+    """Подмена BaseSerializer.data и Serializer._readable_fields."""
+    serializers.BaseSerializer.data = property(data)
+    serializers.Serializer._readable_fields = property(_readable_fields)
+
+
+@contextmanager
+def detect_n_plus_one(mode=RAISE):
+    """Поиск N+1 внутри блока, например в тесте:
+
+        with detect_n_plus_one():
+            response = client.get('/api/recipes/')
+    """
+    install()
+    previous = getattr(_state, 'mode', None)
+    _state.mode = mode
+    try:
+        yield
+    finally:
+        _state.mode = previous
@@ -1,4 +1,14 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from recipe.constants import PAGINATION_PAGE_SIZE
 
@@ -8,3 +18,109 @@ class Pagination(PageNumberPagination):
 
     page_size = PAGINATION_PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(Pagination):
+    """Пагинация по ключу без COUNT и OFFSET.
+
+    Включается параметром ?cursor= (пустой - первая страница), без него
+    работает обычная постраничная пагинация. Курсор хранит значения
+    полей ordering у последнего объекта страницы.
+    """
+
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_after_filter(position))
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.results = results[:page_size]
+        return self.results
+
+    def get_fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_after_filter(self, position):
+        """Условие (a, b) > (x, y) с учётом направления сортировки."""
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous: position[previous]
+                for previous in self.get_fields()[:index]
+            }
+            conditions.append(
+                Q(**equal, **{f'{name}__{lookup}': position[name]}))
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            fields = self.get_fields()
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            position = {
+                name: model._meta.get_field(name).to_python(value)
+                for name, value in zip(fields, values)
+            }
+            # None не сравнивается в условии курсора
+            if None in position.values():
+                raise ValueError
+            return position
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj):
+        values = [
+            obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            for name in self.get_fields()
+        ]
+        data = json.dumps([
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.results[-1]))
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class RecipePagination(KeysetPagination):
+    """Пагинация рецептов по (pub_date, id)."""
+
+    ordering = ('-pub_date', '-id')
+
+
+class UserPagination(KeysetPagination):
+    """Пагинация юзеров и подписок по id."""
+
+    ordering = ('id',)
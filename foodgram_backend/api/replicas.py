@@ -0,0 +1,124 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+_state = threading.local()
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def pin_key(user_id):
+    return f'db:primary_pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Чтение юзера с основной базы, пока реплики догоняют его запись."""
+    if settings.DB_PRIMARY_PIN_SECONDS:
+        cache.set(pin_key(user.pk), True, settings.DB_PRIMARY_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return cache.get(pin_key(user.pk)) is not None
+
+
+def get_read_replica():
+    """Реплика, с которой читает текущий запрос, или None."""
+    return getattr(_state, 'replica', None)
+
+
+@contextmanager
+def primary():
+    """Чтение с основной базы внутри блока."""
+    replica = get_read_replica()
+    _state.replica = None
+    try:
+        yield
+    finally:
+        _state.replica = replica
+
+
+def from_primary(instances, queryset):
+    """Те же объекты из queryset основной базы, если запрос читает с реплики.
+
+    Нужно перед записью данных в общий кэш: отставшая реплика
+    иначе сохранила бы в нём устаревшее представление. Связанные
+    данные объектов тоже читаются с основной базы, по их _state.db.
+    """
+    if get_read_replica() is None or not instances:
+        return instances
+    fresh = queryset.using(DEFAULT_DB_ALIAS).in_bulk(
+        [instance.pk for instance in instances])
+    return [fresh.get(instance.pk, instance) for instance in instances]
+
+
+class ReplicaRouter:
+    """Запись на основную базу, чтение с реплики, если её выбрал запрос.
+
+    Связанные объекты читаются из той же базы, что и объект,
+    через который к ним обращаются.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return get_read_replica()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """Безопасные запросы вьюсета читают со случайной реплики.
+
+    replica_actions ограничивает действия, None - все. Юзер после
+    успешного изменяющего запроса читает с основной базы
+    DB_PRIMARY_PIN_SECONDS секунд, чтобы видеть свои изменения.
+    """
+
+    replica_actions = None
+
+    def reads_from_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        if (self.replica_actions is not None
+                and self.action not in self.replica_actions):
+            return False
+        return not (request.user.is_authenticated
+                    and is_pinned(request.user))
+
+    def dispatch(self, request, *args, **kwargs):
+        # Сброс и при исключении, которое DRF не превращает в ответ,
+        # иначе следующий запрос потока читал бы с реплики
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _state.replica = None
+
+    def initial(self, request, *args, **kwargs):
+        _state.replica = None
+        super().initial(request, *args, **kwargs)
+        replicas = get_replicas()
+        if replicas and self.reads_from_replica(request):
+            _state.replica = random.choice(replicas)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _state.replica = None
+        if (request.method not in SAFE_METHODS
+                and response.status_code < 400 and get_replicas()
+                and request.user.is_authenticated):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -2,23 +2,51 @@ import re
 
 import django.contrib.auth.password_validation as validators
 from django.core import exceptions
+from django.core.files.storage import default_storage
 from django.db import transaction
+from django.db.models import Value, prefetch_related_objects
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.serializers import (ModelSerializer,
-                                        PrimaryKeyRelatedField,
-                                        SerializerMethodField)
+from rest_framework.serializers import ModelSerializer, SerializerMethodField
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
-from api.utils import create_objects_bulk
-from recipe.constants import (MAX_AMOUNT, MAX_COOKING_TIME,
-                              MAX_LENGTH_USERNAME, MIN_AMOUNT,
-                              MIN_COOKING_TIME)
+from api.utils import (create_objects_bulk, get_missing_ids,
+                       get_recipe_prefetch, get_recipes_limit,
+                       update_recipe_ingredients, update_recipe_tags)
+from recipe.constants import (BULK_RECIPES_LIMIT, MAX_AMOUNT,
+                              MAX_COOKING_TIME, MAX_LENGTH_USERNAME,
+                              MIN_AMOUNT, MIN_COOKING_TIME)
+from recipe.images import rendition_names
 from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                           ShoppingCart, Tag, TagRecipe)
+                           ShoppingCart, ShoppingListItem, Tag, TagRecipe)
 from users.models import Subscriptions, User
 
 
+class ImageRenditionsField(serializers.Field):
+    """Ссылки на варианты фото рецепта, None пока они не готовы."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.has_renditions:
+            return None
+        request = self.context.get('request')
+        return {
+            rendition: {
+                image_format: (
+                    request.build_absolute_uri(default_storage.url(name))
+                    if request else default_storage.url(name)
+                )
+                for image_format, name in formats.items()
+            }
+            for rendition, formats in rendition_names(
+                recipe.image.name).items()
+        }
+
+
 class UserSerializer(ModelSerializer):
     """Сериализатор модель юзеров."""
 
@@ -30,6 +58,8 @@ class UserSerializer(ModelSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         return (
             user.is_authenticated and user.subscriptions.filter(
@@ -131,11 +161,6 @@ class RecipeIngredientSerializer(ModelSerializer):
         read_only_fields = ('name', 'measurement_unit')
 
     def validate(self, data):
-        ingredient_ids = data['ingredient']['id']
-        if not Ingredient.objects.filter(id=ingredient_ids).exists():
-            raise serializers.ValidationError(
-                'Добавьте существующий ингредиент.'
-            )
         if data['amount'] in (None, 0):
             raise serializers.ValidationError(
                 'Количество ингредиента обязательно для заполнения. '
@@ -148,10 +173,11 @@ class RecipeSimpleSerializer(ModelSerializer):
     """Короткий Сериализатор рецепта для отображения."""
 
     image = Base64ImageField()
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image',
+        fields = ('id', 'name', 'image', 'image_renditions',
                   'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
@@ -163,6 +189,7 @@ class RecipeGetSerializer(ModelSerializer):
     is_in_shopping_cart = SerializerMethodField()
     author = UserSerializer(read_only=True)
     image = Base64ImageField()
+    image_renditions = ImageRenditionsField()
     ingredients = RecipeIngredientSerializer(
         source='recipe_set',
         many=True
@@ -172,10 +199,12 @@ class RecipeGetSerializer(ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
-                  'name', 'image', 'text', 'cooking_time',
+                  'name', 'image', 'image_renditions', 'text', 'cooking_time',
                   'is_in_shopping_cart', 'is_favorited')
 
     def get_is_favorited(self, object):
+        if hasattr(object, 'is_favorited'):
+            return object.is_favorited
         user = self.context['request'].user
         return (
             (user is not None and user.is_authenticated) and (
@@ -184,6 +213,8 @@ class RecipeGetSerializer(ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, object):
+        if hasattr(object, 'is_in_shopping_cart'):
+            return object.is_in_shopping_cart
         user = self.context['request'].user
         return (
             (user is not None and user.is_authenticated) and (
@@ -201,9 +232,8 @@ class RecipePostSerializer(ModelSerializer):
         source='recipe_set',
         many=True
     )
-    tags = PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
         error_messages={
             'required': 'Добавлять можно только уже существующие теги.'
         }
@@ -220,6 +250,9 @@ class RecipePostSerializer(ModelSerializer):
 
     def to_representation(self, instance):
         request = self.context.get('request')
+        # Рецепт меняет только автор, подписаться на себя нельзя.
+        prefetch_related_objects(
+            [instance], *get_recipe_prefetch(Value(False)))
         serializer = RecipeGetSerializer(
             instance,
             context={'request': request}
@@ -253,10 +286,35 @@ class RecipePostSerializer(ModelSerializer):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться.'
             )
+        tags = Tag.objects.in_bulk(tags_ids)
+        ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        errors = {}
+        missing_tags = get_missing_ids(tags, tags_ids)
+        if missing_tags:
+            errors['tags'] = (
+                'Добавлять можно только уже существующие теги: '
+                f'{missing_tags}.'
+            )
+        missing_ingredients = get_missing_ids(ingredients, ingredient_ids)
+        if missing_ingredients:
+            errors['ingredients'] = (
+                f'Добавьте существующий ингредиент: {missing_ingredients}.'
+            )
+        if errors:
+            raise serializers.ValidationError(errors)
+        data['tags'] = [tags[pk] for pk in tags_ids]
+        for ingredient in data['recipe_set']:
+            ingredient['ingredient'] = ingredients[
+                ingredient['ingredient']['id']]
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
-        """Создание рецепта."""
+        """Создание рецепта.
+
+        В одной транзакции с тегами и ингредиентами: версии кэша
+        сдвигаются после фиксации, когда рецепт уже полный.
+        """
         validated_data['author'] = self.context['request'].user
         ingredients = validated_data.pop('recipe_set')
         tags = set(validated_data.pop('tags'))
@@ -271,19 +329,21 @@ class RecipePostSerializer(ModelSerializer):
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление рецепта."""
+        """Обновление рецепта.
+
+        Теги и ингредиенты не пересоздаются: удаляются только убранные,
+        добавляются только новые, у оставшихся меняется количество.
+        """
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipe_set')
-        instance.tags.clear()
-        instance.ingredients.clear()
-        create_objects_bulk(
-            TagRecipe,
+        update_recipe_tags(instance, tags)
+        old_amounts = update_recipe_ingredients(instance, ingredients)
+        ShoppingListItem.objects.apply_recipe_change(
             instance,
-            objects=tags)
-        create_objects_bulk(
-            RecipeIngredient,
-            instance,
-            objects=ingredients)
+            old_amounts,
+            {ingredient['ingredient'].id: ingredient['amount']
+             for ingredient in ingredients}
+        )
         return super().update(instance, validated_data)
 
 
@@ -291,7 +351,6 @@ class LookSubscriptionsSerializer(UserSerializer):
     """Сериализатор отображения подписки."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = SerializerMethodField()
 
     class Meta:
         model = User
@@ -299,26 +358,21 @@ class LookSubscriptionsSerializer(UserSerializer):
             'recipes', 'recipes_count'
         )
         read_only_fields = ('email', 'id', 'username',
-                            'first_name', 'last_name',)
+                            'first_name', 'last_name', 'recipes_count')
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes_limit = None
-        if request:
-            recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            if not recipes_limit.isdigit():
-                raise serializers.ValidationError(
-                    'recipes_limit не может быть преобразовано в int'
-                )
-            recipes = obj.recipes.all()[:int(recipes_limit)]
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            recipes = recipes_by_author.get(obj.id, [])
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(request) if request else None
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return RecipeSimpleSerializer(recipes, many=True,
                                       context={'request': request}).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class SubscriptionsSerializer(serializers.ModelSerializer):
     """Сериализатор для работы с подпиской."""
@@ -391,3 +445,13 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             instance.recipe,
             context={'request': request}
         ).data
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для пакетных операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT
+    )
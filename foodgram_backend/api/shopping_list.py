@@ -0,0 +1,180 @@
+import csv
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import status
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+
+from recipe.constants import (SHOPPING_LIST_CHUNK_SIZE,
+                              SHOPPING_LIST_PDF_SPOOL_SIZE)
+
+logger = logging.getLogger(__name__)
+
+SHOPPING_LIST_TITLE = 'Список покупок:'
+SHOPPING_LIST_FILENAME = 'shopping_cart'
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_MISSING = 'Выгрузка в PDF недоступна, выберите txt или csv'
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Рендерер для выбора формата списка покупок через ?format=.
+
+    Сам список отдаётся потоковым ответом, рендерер используется
+    только для ответов с ошибками.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
+
+
+class TxtShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CsvShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PdfShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+SHOPPING_LIST_RENDERERS = (
+    TxtShoppingListRenderer,
+    CsvShoppingListRenderer,
+    PdfShoppingListRenderer,
+)
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Формат по ?format= или Accept, без подходящего Accept - txt.
+
+    Клиенты с Accept: application/json получали список и до выбора
+    формата, поэтому ответ 406 им не отдаётся.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def format_line(ingredient):
+    return (f'{ingredient["name"]} - {ingredient["amount"]}, '
+            f'{ingredient["measurement_unit"]}')
+
+
+def txt_lines(ingredients):
+    yield f'{SHOPPING_LIST_TITLE}\n'
+    for ingredient in ingredients:
+        yield f'\n{format_line(ingredient)}'
+
+
+def csv_lines(ingredients):
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(
+        ('Ингредиент', 'Единица измерения', 'Количество'))
+    for ingredient in ingredients:
+        yield writer.writerow((ingredient['name'],
+                               ingredient['measurement_unit'],
+                               ingredient['amount']))
+
+
+def get_pdf_font():
+    """Регистрация шрифта с кириллицей, None если его нет в системе.
+
+    Встроенные шрифты PDF не содержат кириллицы, поэтому без него
+    названия ингредиентов вывести нельзя.
+    """
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        logger.error('Шрифт для PDF не найден: %s',
+                     settings.SHOPPING_LIST_PDF_FONT)
+        return None
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT))
+    return PDF_FONT_NAME
+
+
+def pdf_file(ingredients, font):
+    """PDF во временном файле, который уходит на диск при росте."""
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=SHOPPING_LIST_PDF_SPOOL_SIZE)
+    height = A4[1]
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(SHOPPING_LIST_TITLE)
+    position = height - PDF_MARGIN
+    pdf.setFont(font, 16)
+    pdf.drawString(PDF_MARGIN, position, SHOPPING_LIST_TITLE)
+    position -= 2 * PDF_LINE_HEIGHT
+    pdf.setFont(font, 12)
+    for ingredient in ingredients:
+        if position < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            position = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, position, format_line(ingredient))
+        position -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    return buffer
+
+
+def download_shopping_list(ingredients, file_format):
+    """Потоковая выгрузка списка покупок в формате txt, csv или pdf.
+
+    ingredients - queryset со строками name, measurement_unit, amount;
+    строки читаются серверным курсором порциями, поэтому расход памяти
+    не зависит от размера корзины.
+    """
+    rows = ingredients.iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+    filename = f'{SHOPPING_LIST_FILENAME}.{file_format}'
+    if file_format == PdfShoppingListRenderer.format:
+        font = get_pdf_font()
+        if font is None:
+            return Response(PDF_FONT_MISSING,
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return FileResponse(
+            pdf_file(rows, font),
+            as_attachment=True,
+            filename=filename,
+            content_type=PdfShoppingListRenderer.media_type
+        )
+    if file_format == CsvShoppingListRenderer.format:
+        lines = csv_lines(rows)
+        content_type = CsvShoppingListRenderer.media_type
+    else:
+        lines = txt_lines(rows)
+        content_type = TxtShoppingListRenderer.media_type
+    response = StreamingHttpResponse(
+        lines, content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,86 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api.authentication import user_cache
+from api.cache import bump_author, bump_catalog, bump_recipe
+from api.conditional import bump_recipes_version
+from recipe.images import renditions_ready
+from recipe.models import Ingredient, Recipe, RecipeIngredient, Tag, TagRecipe
+from recipe.signals import ingredients_loaded
+from users.models import User
+
+# Поля автора, которые входят в представление рецепта
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(instance, **kwargs):
+    """Сброс кэша рецепта при его изменении."""
+    bump_recipe(instance.pk)
+    bump_recipes_version()
+
+
+@receiver(renditions_ready)
+def invalidate_recipe_renditions(recipe_id, **kwargs):
+    """Сброс кэша рецепта, когда готовы варианты его фото."""
+    bump_recipe(recipe_id)
+    bump_recipes_version()
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=TagRecipe)
+def invalidate_recipe_relations(instance, **kwargs):
+    """Сброс кэша рецепта при изменении тегов и ингредиентов из админки."""
+    bump_recipe(instance.recipe_id)
+    bump_recipes_version()
+
+
+@receiver(ingredients_loaded)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_catalog(**kwargs):
+    """Сброс кэша всех рецептов при изменении тегов и ингредиентов."""
+    bump_catalog()
+
+
+@receiver(pre_save, sender=User)
+def check_author_fields(instance, update_fields, using, **kwargs):
+    """Отметка, изменились ли поля автора в представлении рецепта.
+
+    Сравниваются значения: CountersMixin передаёт в update_fields
+    все поля, поэтому по их списку изменение не определить.
+    """
+    instance._author_changed = True
+    if instance._state.adding:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & update_fields:
+        instance._author_changed = False
+        return
+    old = User.objects.using(using).filter(pk=instance.pk).values(
+        *AUTHOR_FIELDS).first()
+    instance._author_changed = old is None or any(
+        old[field] != getattr(instance, field) for field in AUTHOR_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(instance, **kwargs):
+    """Сброс кэша рецептов автора при изменении его данных."""
+    if getattr(instance, '_author_changed', True):
+        bump_author(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, created, **kwargs):
+    """Сдвиг даты изменения рецептов при изменении данных автора."""
+    if created or not getattr(instance, '_author_changed', True):
+        return
+    if Recipe.objects.filter(author=instance).update(
+            modified=timezone.now()):
+        bump_recipes_version()
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user(instance, **kwargs):
+    """Сброс юзера в кэше JWT-аутентификации этого процесса."""
+    user_cache.delete(instance.pk)
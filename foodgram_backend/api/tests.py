@@ -0,0 +1,343 @@
+import base64
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.cache import recipe_version_key
+from api.catalog import bump_catalog_version, get_catalog_version
+
+from recipe.counters import reconcile_counters
+from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                           ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from users.models import Subscriptions, User
+
+LIST_URLS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=2',
+    '/api/recipes/?limit=2&page=2',
+    '/api/recipes/?cursor=&limit=2',
+    '/api/recipes/?tags=breakfast',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False)
+class FastSerializationTest(TestCase):
+    """Быстрая сериализация рецептов отдаёт тот же JSON, что и
+    RecipeGetSerializer, байт в байт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестов', password='pass')
+        authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}', first_name='Автор',
+                last_name=f'"Номер" {number}', password='pass')
+            for number in range(2)
+        ]
+        tags = [
+            Tag.objects.create(name=name, slug=slug, color=color)
+            for name, slug, color in (
+                ('Завтрак', 'breakfast', '#E26C2D'),
+                ('Ужин', 'dinner', '#8775D2'),
+                ('Обед', 'lunch', '#49B64E'),
+            )
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('яйца', 'шт.'), ('абрикос', 'г'), ('молоко', 'мл'),
+                ('соль', 'по вкусу'),
+            )
+        ]
+        images = (
+            'recipes/images/omelette.jpg',
+            'recipes/images/фото с пробелом.jpg',
+            'recipes/images/100%&#.png',
+        )
+        cls.recipes = []
+        for number, image in enumerate(images):
+            recipe = Recipe.objects.create(
+                author=authors[number % 2], name=f'Рецепт «{number}»',
+                image=image, text='Текст\nс переносом и "кавычками"',
+                cooking_time=number + 1)
+            cls.recipes.append(recipe)
+            # Ингредиенты не по алфавиту и не по id
+            for ingredient in reversed(ingredients[number:]):
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=10 * (number + 1))
+            for tag in reversed(tags[:number + 1]):
+                TagRecipe.objects.create(recipe=recipe, tag=tag)
+        # Рецепт без тегов, ингредиентов и фото, с готовыми вариантами фото
+        cls.recipes.append(Recipe.objects.create(
+            author=authors[0], name='Пустой', image='', text='Пусто',
+            cooking_time=1))
+        Recipe.objects.filter(pk=cls.recipes[0].pk).update(
+            has_renditions=True)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Subscriptions.objects.create(user=cls.user, author=authors[1])
+
+    def get_clients(self):
+        authorized = APIClient()
+        authorized.force_authenticate(self.user)
+        return APIClient(), authorized
+
+    def get_both(self, client, url):
+        responses = []
+        for fast in (False, True):
+            with override_settings(RECIPE_FAST_SERIALIZATION=fast):
+                responses.append(client.get(url))
+        return responses
+
+    def assertSameResponse(self, client, url):
+        expected, actual = self.get_both(client, url)
+        self.assertEqual(expected.status_code, actual.status_code, url)
+        self.assertEqual(expected.content, actual.content, url)
+        return actual
+
+    def test_list(self):
+        for authorized, client in enumerate(self.get_clients()):
+            for url in LIST_URLS:
+                with self.subTest(url=url, authorized=authorized):
+                    self.assertSameResponse(client, url)
+
+    def test_detail(self):
+        for authorized, client in enumerate(self.get_clients()):
+            for recipe in self.recipes:
+                url = f'/api/recipes/{recipe.pk}/'
+                with self.subTest(url=url, authorized=authorized):
+                    response = self.assertSameResponse(client, url)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_missing_detail(self):
+        for url in ('/api/recipes/0/', '/api/recipes/abc/'):
+            with self.subTest(url=url):
+                response = self.assertSameResponse(APIClient(), url)
+                self.assertEqual(response.status_code, 404)
+
+    def test_cursor_next_page(self):
+        client = APIClient()
+        first, _ = self.get_both(client, '/api/recipes/?cursor=&limit=2')
+        self.assertSameResponse(client, first.json()['next'])
+
+    def test_renditions_and_flags(self):
+        _, client = self.get_clients()
+        with override_settings(RECIPE_FAST_SERIALIZATION=True):
+            data = client.get(f'/api/recipes/{self.recipes[0].pk}/').json()
+        self.assertIsNotNone(data['image_renditions'])
+        self.assertTrue(data['is_favorited'])
+        self.assertEqual(
+            [ingredient['name'] for ingredient in data['ingredients']],
+            ['соль', 'молоко', 'абрикос', 'яйца'])
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        _, client = self.get_clients()
+        with override_settings(RECIPE_FAST_SERIALIZATION=True):
+            client.get('/api/recipes/?limit=1')
+            with self.assertNumQueries(6):
+                client.get('/api/recipes/?limit=1')
+            with self.assertNumQueries(6):
+                client.get('/api/recipes/?limit=10')
+
+
+class CacheVersionTest(TestCase):
+    """Версии кэша сдвигаются только после фиксации транзакции."""
+
+    def test_recipe_version_bumped_on_commit(self):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Тестов', password='pass')
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', image='', text='Текст',
+            cooking_time=1)
+        key = recipe_version_key(recipe.pk)
+        cache.delete(key)
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe.save()
+            self.assertIsNone(cache.get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNotNone(cache.get(key))
+
+
+class CatalogVersionTest(TestCase):
+    """Версия справочников растёт после фиксации и при каждом сбросе."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        stamp = Path(directory.name) / '.catalog_version'
+        self.settings_override = override_settings(CATALOG_VERSION_STAMP=stamp)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_bumped_on_commit(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_catalog_version()
+            self.assertEqual(get_catalog_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_quick_bumps_differ(self):
+        versions = []
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                bump_catalog_version()
+            versions.append(get_catalog_version())
+        self.assertEqual(versions, sorted(set(versions)))
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class KeysetPaginationTest(TestCase):
+    """Неверный курсор - 404, а не ошибка сервера."""
+
+    def test_invalid_cursor(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестов', password='pass'))
+        cursors = {
+            '/api/recipes/': (
+                [None, None], ['2020-01-01T00:00:00', None], [None, 1],
+                {'pub_date': 1, 'id': 1}, [1], 'мусор',
+            ),
+            '/api/users/': ([None], 'ab', [[]]),
+            '/api/users/subscriptions/': ([None], ['x']),
+        }
+        for url, values in cursors.items():
+            for value in values:
+                cursor = (value if isinstance(value, str)
+                          else encode_cursor(value))
+                with self.subTest(url=url, cursor=value):
+                    response = client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 404)
+
+    def test_next_cursor(self):
+        client = APIClient()
+        for number in range(3):
+            User.objects.create_user(
+                email=f'user{number}@example.com', username=f'user{number}',
+                first_name='Юзер', last_name='Тестов', password='pass')
+        response = client.get('/api/users/', {'cursor': '', 'limit': 2})
+        self.assertEqual(list(response.json()), ['next', 'results'])
+        response = client.get(response.json()['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['next'])
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class ShoppingListDownloadTest(TestCase):
+    """Выбор формата списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестов', password='pass')
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', image='', text='Текст',
+            cooking_time=1)
+        RecipeIngredient.objects.create(
+            recipe=recipe, amount=2,
+            ingredient=Ingredient.objects.create(
+                name='яйца', measurement_unit='шт.'))
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, **kwargs):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_txt_without_matching_accept(self):
+        for accept in ('application/json', 'image/png', '*/*'):
+            with self.subTest(accept=accept):
+                response = self.download(HTTP_ACCEPT=accept)
+                self.assertTrue(
+                    response['Content-Type'].startswith('text/plain'))
+                self.assertIn('яйца - 2, шт.',
+                              b''.join(response.streaming_content).decode())
+
+    def test_format(self):
+        response = self.download(data={'format': 'csv'})
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        response = self.download(HTTP_ACCEPT='text/csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'xls'})
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkRecipesTest(TestCase):
+    """Массовое удаление сохраняет счётчики и список покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестов', password='pass')
+        other = User.objects.create_user(
+            email='other@example.com', username='other',
+            first_name='Другой', last_name='Тестов', password='pass')
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'соль')
+        ]
+        cls.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=other, name=f'Рецепт {number}', image='',
+                text='Текст', cooking_time=1)
+            for ingredient in ingredients[number:]:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1)
+            cls.recipes.append(recipe)
+        for user in (cls.user, other):
+            for recipe in cls.recipes:
+                Favorite.objects.create(user=user, recipe=recipe)
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def test_bulk_remove(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        ids = [self.recipes[0].pk, self.recipes[2].pk, 10 ** 6]
+        for url in ('/api/recipes/bulk/favorite/',
+                    '/api/recipes/bulk/shopping_cart/'):
+            with self.subTest(url=url):
+                response = client.delete(
+                    url, {'recipes': ids}, format='json')
+                self.assertEqual(
+                    [item['status'] for item in response.json()['results']],
+                    ['removed', 'removed', 'not_found'])
+                response = client.delete(
+                    url, {'recipes': ids}, format='json')
+                self.assertEqual(
+                    [item['status'] for item in response.json()['results']],
+                    ['absent', 'absent', 'not_found'])
+        self.assertFalse(any(reconcile_counters(check=True).values()))
+        self.assertEqual(
+            sorted(ShoppingListItem.objects.values_list(
+                'user', 'ingredient', 'amount')),
+            sorted(ShoppingListItem.objects.expected()))
+        self.assertEqual(
+            list(self.user.shopping_cart.values_list('recipe', flat=True)),
+            [self.recipes[1].pk])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from django.views.generic import TemplateView
 from rest_framework.routers import DefaultRouter
@@ -24,3 +25,6 @@ urlpatterns = [
     path('docs/openapi-schema.yml', views.OpenAPISchemaView.as_view(),
          name='openapi-schema')
 ]
+
+if settings.JWT_AUTH_ENABLED:
+    urlpatterns.append(path('auth/', include('djoser.urls.jwt')))
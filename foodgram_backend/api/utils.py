@@ -1,18 +1,49 @@
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from rest_framework import status
+from collections import defaultdict
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers, status
 from rest_framework.response import Response
 
-from recipe.models import Ingredient, RecipeIngredient, Tag, TagRecipe
+from recipe.counters import update_recipe_counters
+from recipe.models import (Recipe, RecipeIngredient, ShoppingCart,
+                           ShoppingListItem, TagRecipe)
+from users.models import User
+
+
+def get_recipe_prefetch(is_subscribed):
+    """Подгрузка автора, тегов и ингредиентов рецептов.
+
+    is_subscribed - выражение для флага подписки на автора.
+    """
+    return (
+        Prefetch(
+            'author',
+            queryset=User.objects.annotate(is_subscribed=is_subscribed)
+        ),
+        'tags',
+        Prefetch(
+            'recipe_set',
+            # Явный порядок: его повторяет api.fast_serializers
+            queryset=RecipeIngredient.objects.select_related(
+                'ingredient').order_by('recipe', 'id')
+        ),
+    )
+
+
+def get_missing_ids(objects, ids):
+    """Строка с id, которых нет в словаре объектов из in_bulk."""
+    return ', '.join(str(pk) for pk in ids if pk not in objects)
 
 
 def get_data_for_bulk(model, recipe, objects=None):
     mapping = {
         TagRecipe: lambda tag: {
-            'recipe': recipe, 'tag': tag.id},
+            'recipe': recipe, 'tag': tag},
         RecipeIngredient: lambda ingredient: {
             'recipe': recipe,
-            'ingredient': ingredient['ingredient']['id'],
+            'ingredient': ingredient['ingredient'],
             'amount': ingredient['amount']}
     }
     if model in mapping:
@@ -21,28 +52,71 @@ def get_data_for_bulk(model, recipe, objects=None):
 
 
 def create_objects_bulk(model, recipe, objects=None):
-
+    """Создание строк промежуточной модели из уже загруженных объектов."""
     data_list = get_data_for_bulk(model, recipe, objects)
+    model.objects.bulk_create([model(**data) for data in data_list])
 
-    model_to_related_model = {
-        TagRecipe: (Tag, 'tag'),
-        RecipeIngredient: (Ingredient, 'ingredient')
+
+def update_recipe_tags(recipe, tags):
+    """Замена тегов рецепта без пересоздания оставшихся строк."""
+    current = set(
+        TagRecipe.objects.filter(recipe=recipe).values_list(
+            'tag_id', flat=True).order_by()
+    )
+    removed = current - {tag.id for tag in tags}
+    if removed:
+        TagRecipe.objects.filter(recipe=recipe, tag_id__in=removed).delete()
+    added = [tag for tag in tags if tag.id not in current]
+    if added:
+        create_objects_bulk(TagRecipe, recipe, objects=added)
+
+
+def update_recipe_ingredients(recipe, ingredients):
+    """Замена ингредиентов рецепта по разнице со старым составом.
+
+    Возвращает старые количества {id ингредиента: количество}.
+    """
+    current = {
+        item.ingredient_id: item
+        for item in RecipeIngredient.objects.filter(recipe=recipe).order_by()
+    }
+    old_amounts = {
+        ingredient: item.amount for ingredient, item in current.items()
+    }
+    new_amounts = {
+        ingredient['ingredient'].id: ingredient['amount']
+        for ingredient in ingredients
     }
-    if model not in model_to_related_model:
-        raise ValueError('Недопустимая модель')
-    related_model, related_field = model_to_related_model[model]
+    removed = current.keys() - new_amounts.keys()
+    if removed:
+        RecipeIngredient.objects.filter(
+            recipe=recipe, ingredient_id__in=removed).delete()
+    changed = []
+    for ingredient, item in current.items():
+        amount = new_amounts.get(ingredient)
+        if amount is not None and amount != item.amount:
+            item.amount = amount
+            changed.append(item)
+    if changed:
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+    added = [
+        ingredient for ingredient in ingredients
+        if ingredient['ingredient'].id not in current
+    ]
+    if added:
+        create_objects_bulk(RecipeIngredient, recipe, objects=added)
+    return old_amounts
 
-    instances = []
-    for data in data_list:
-        instance = model()
-        related_obj = get_object_or_404(related_model, id=data[related_field])
-        setattr(instance, related_field, related_obj)
-        for key, value in data.items():
-            if key != related_field:
-                setattr(instance, key, value)
-        instances.append(instance)
 
-    model.objects.bulk_create(instances)
+def lock_user(user):
+    """Блокировка строки юзера до конца транзакции.
+
+    Изменения избранного и корзины одного юзера идут по очереди,
+    поэтому прочитанный список его записей не устаревает до вставки
+    или удаления, и счётчики не учитывают чужие изменения.
+    """
+    list(User.objects.select_for_update().filter(
+        pk=user.pk).values_list('pk', flat=True))
 
 
 def create_model_instance(request, instance, serializer_name):
@@ -52,22 +126,145 @@ def create_model_instance(request, instance, serializer_name):
         context={'request': request}
     )
     serializer.is_valid(raise_exception=True)
-    serializer.save()
+    try:
+        with transaction.atomic():
+            lock_user(request.user)
+            serializer.save()
+    except IntegrityError:
+        # Параллельный запрос успел создать запись после проверки,
+        # повторная проверка вернёт сообщение валидатора уникальности.
+        serializer = serializer_name(
+            data=serializer.initial_data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        raise
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 def delete_model_instance(request, model_name, instance, error_message):
     """Удаление рецепта из избранного и списка покупок."""
-    if not model_name.objects.filter(user=request.user,
-                                     recipe=instance).exists():
-        return Response({'errors': error_message},
-                        status=status.HTTP_400_BAD_REQUEST)
-    model_name.objects.filter(user=request.user, recipe=instance).delete()
+    with transaction.atomic():
+        lock_user(request.user)
+        entries = model_name.objects.filter(user=request.user,
+                                            recipe=instance)
+        if not entries.exists():
+            return Response({'errors': error_message},
+                            status=status.HTTP_400_BAD_REQUEST)
+        entries.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def download_shopping_list(shopping_list):
-    response = HttpResponse(shopping_list, content_type='text/plain')
-    response['Content-Disposition'] = \
-        'attachment; filename="shopping_cart.txt"'
-    return response
+def bulk_add_recipes(user, model, recipe_ids):
+    """Добавление рецептов в избранное или корзину одной транзакцией.
+
+    Возвращает статус по каждому id: added, exists или not_found.
+    bulk_create обходит сигналы, поэтому счётчики и сводный список
+    покупок обновляются здесь же.
+    """
+    with transaction.atomic():
+        lock_user(user)
+        found = set(Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', flat=True))
+        existing = set(model.objects.filter(
+            user=user, recipe_id__in=found).values_list(
+                'recipe_id', flat=True).order_by())
+        added = found - existing
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=recipe_id) for recipe_id in added],
+            ignore_conflicts=True
+        )
+        update_recipe_counters(model, added, 1)
+        if model is ShoppingCart:
+            ShoppingListItem.objects.apply_recipes([user.id], added)
+    return get_bulk_results(
+        recipe_ids, (added, 'added'), (existing, 'exists'))
+
+
+def delete_rows(model, ids):
+    """Удаление строк по id одним DELETE, без сигналов на каждую строку.
+
+    QuerySet.delete() при обработчиках pre_delete/post_delete
+    повторил бы пересчёт счётчиков и списка покупок, уже сделанный
+    одним запросом.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            ids
+        )
+
+
+def bulk_remove_recipes(user, model, recipe_ids):
+    """Удаление рецептов из избранного или корзины одним DELETE.
+
+    Возвращает статус по каждому id: removed, absent или not_found.
+    """
+    with transaction.atomic():
+        lock_user(user)
+        found = set(Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', flat=True))
+        entries = dict(model.objects.filter(
+            user=user, recipe_id__in=found).values_list(
+                'id', 'recipe_id').order_by())
+        removed = set(entries.values())
+        if model is ShoppingCart:
+            ShoppingListItem.objects.apply_recipes(
+                [user.id], removed, sign=-1)
+        delete_rows(model, entries)
+        update_recipe_counters(model, removed, -1)
+    return get_bulk_results(
+        recipe_ids, (removed, 'removed'), (found - removed, 'absent'))
+
+
+def get_bulk_results(recipe_ids, *groups):
+    statuses = {}
+    for ids, result in groups:
+        statuses.update(dict.fromkeys(ids, result))
+    return [
+        {'id': recipe_id, 'status': statuses.get(recipe_id, 'not_found')}
+        for recipe_id in dict.fromkeys(recipe_ids)
+    ]
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    if not recipes_limit.isdigit():
+        raise serializers.ValidationError(
+            'recipes_limit не может быть преобразовано в int'
+        )
+    return int(recipes_limit)
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """Последние limit рецептов каждого автора одним запросом.
+
+    Рецепты нумеруются ROW_NUMBER() в разрезе автора, отбор первых limit
+    выполняется во внешнем запросе.
+    """
+    recipes = Recipe.objects.filter(author__in=author_ids)
+    if limit is not None:
+        sql, params = recipes.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author')],
+                order_by=F('pub_date').desc()
+            )
+        ).query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+            'ORDER BY author_id, row_number',
+            (*params, limit)
+        )
+    recipes_by_author = defaultdict(list)
+    for recipe in recipes:
+        recipes_by_author[recipe.author_id].append(recipe)
+    return recipes_by_author
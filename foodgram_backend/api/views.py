@@ -1,35 +1,51 @@
+from django.conf import settings
 from django.contrib.auth.hashers import check_password
-from django.db.models import Sum
+from django.db.models import Exists, F, OuterRef, Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from django.views.generic import TemplateView
 from djoser.views import UserViewSet
-from rest_framework import status, viewsets
+from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (
-    AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly)
+    SAFE_METHODS, AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from api.cache import serialize_recipes
+from api.catalog import ingredients_payload, tags_payload
+from api.conditional import (NO_VALIDATORS, conditional_response,
+                             get_detail_validators, get_list_validators,
+                             is_conditional)
+from api.fast_serializers import get_recipe_rows, serialize_recipe_rows
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import Pagination
+from api.pagination import RecipePagination, UserPagination
 from api.permissions import AuthorOrReadOnly
-from api.serializers import (CreateUserSerializer, FavoriteSerializer,
+from api.replicas import ReplicaReadMixin, get_read_replica
+from api.serializers import (BulkRecipesSerializer, CreateUserSerializer,
+                             FavoriteSerializer,
                              IngredientSerializer, LookSubscriptionsSerializer,
                              RecipeGetSerializer, RecipePostSerializer,
                              SetPasswordSerializer, ShoppingCartSerializer,
                              SubscriptionsSerializer, TagSerializer,
                              UserSerializer)
-from api.utils import (create_model_instance, delete_model_instance,
-                       download_shopping_list)
+from api.shopping_list import (SHOPPING_LIST_RENDERERS,
+                               ShoppingListNegotiation,
+                               download_shopping_list)
+from api.utils import (bulk_add_recipes, bulk_remove_recipes,
+                       create_model_instance, delete_model_instance,
+                       get_latest_recipes, get_recipe_prefetch,
+                       get_recipes_limit)
+from recipe.ingredient_index import ingredient_index
 from recipe.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from users.models import User
+from users.models import Subscriptions, User
 
 
-class WorkUserViewSet(UserViewSet):
+class WorkUserViewSet(ReplicaReadMixin, UserViewSet):
     """Вьюсет модели юзеров."""
 
+    replica_actions = ('list', 'subscriptions')
     queryset = User.objects.all()
-    pagination_class = Pagination
+    pagination_class = UserPagination
     permission_classes = (AuthorOrReadOnly, )
 
     def get_permissions(self):
@@ -37,6 +53,17 @@ class WorkUserViewSet(UserViewSet):
             return [IsAuthenticated()]
         return super().get_permissions()
 
+    def get_queryset(self):
+        """Флаг подписки одним подзапросом, а не запросом на юзера."""
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(is_subscribed=Value(False))
+        return queryset.annotate(is_subscribed=Exists(
+            Subscriptions.objects.filter(user=user, author=OuterRef('pk'))))
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return UserSerializer
@@ -67,15 +94,23 @@ class WorkUserViewSet(UserViewSet):
             methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        """Отображение подписки."""
+        """Отображение подписки.
+
+        Рецепты всех авторов страницы загружаются одним запросом,
+        количество рецептов хранится в счётчике автора.
+        """
         user = request.user
-        subscribers = User.objects.filter(subscribers__user=user)
+        recipes_limit = get_recipes_limit(request)
+        subscribers = User.objects.filter(subscribers__user=user).annotate(
+            is_subscribed=Value(True))
         pages = self.paginate_queryset(subscribers)
+        recipes_by_author = get_latest_recipes(
+            [author.id for author in pages], recipes_limit)
         serializer = LookSubscriptionsSerializer(
             pages,
             many=True,
             context={'request': request,
-                     'limit': request.query_params.get('recipes_limit')})
+                     'recipes_by_author': recipes_by_author})
         return self.get_paginated_response(serializer.data)
 
     @action(detail=False,
@@ -106,16 +141,102 @@ class WorkUserViewSet(UserViewSet):
         return Response(serializer.data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Вьюсет рецептов."""
 
     filter_backends = DjangoFilterBackend,
     filterset_class = RecipeFilter
-    pagination_class = Pagination
+    pagination_class = RecipePagination
     queryset = Recipe.objects.all()
     http_method_names = ['get', 'post', 'patch', 'create', 'delete']
     permission_classes = (AuthorOrReadOnly, IsAuthenticatedOrReadOnly)
 
+    def use_cache(self):
+        return (settings.RECIPE_CACHE_ENABLED
+                and self.request.method in SAFE_METHODS)
+
+    def use_fast_serialization(self):
+        return (settings.RECIPE_FAST_SERIALIZATION
+                and self.request.method in SAFE_METHODS)
+
+    def get_queryset(self):
+        """Рецепты с флагами текущего юзера и связанными данными.
+
+        Флаги избранного, корзины и подписки на автора вычисляются
+        подзапросами Exists, автор, теги и ингредиенты подгружаются
+        отдельными запросами, поэтому число запросов не зависит
+        от размера страницы. При включённом кэше связанные данные
+        подгружаются только для рецептов, которых нет в кэше, при
+        быстрой сериализации - отдельными запросами .values().
+        """
+        user = self.request.user
+        if user.is_authenticated:
+            is_favorited = Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+            is_in_shopping_cart = Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+            subscriptions = Subscriptions.objects.filter(user=user)
+            is_subscribed = Exists(
+                subscriptions.filter(author=OuterRef('pk')))
+            author_is_subscribed = Exists(
+                subscriptions.filter(author=OuterRef('author')))
+        else:
+            is_favorited = is_in_shopping_cart = Value(False)
+            is_subscribed = author_is_subscribed = Value(False)
+        queryset = Recipe.objects.annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart
+        )
+        if self.use_cache() or self.use_fast_serialization():
+            return queryset.annotate(author_is_subscribed=author_is_subscribed)
+        return queryset.prefetch_related(*get_recipe_prefetch(is_subscribed))
+
+    def reads_from_replica(self, request):
+        # Условный запрос читает с основной базы: ETag и тело должны
+        # быть из одной базы, версии в ETag - версии основной
+        if is_conditional(request):
+            return False
+        return super().reads_from_replica(request)
+
+    def list(self, request, *args, **kwargs):
+        validators = NO_VALIDATORS
+        if get_read_replica() is None:
+            validators = get_list_validators(request)
+        return conditional_response(
+            request, validators, lambda: self.get_list(request))
+
+    def get_list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.use_cache():
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(
+                serialize_recipes(page, request))
+        if self.use_fast_serialization():
+            rows = self.paginate_queryset(get_recipe_rows(queryset))
+            return self.get_paginated_response(
+                serialize_recipe_rows(rows, request))
+        return super().list(request)
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = NO_VALIDATORS
+        if get_read_replica() is None:
+            validators = get_detail_validators(
+                self.kwargs['pk'], request.user)
+        return conditional_response(
+            request, validators, lambda: self.get_detail(request))
+
+    def get_detail(self, request):
+        if self.use_cache():
+            return Response(
+                serialize_recipes([self.get_object()], request)[0])
+        if self.use_fast_serialization():
+            # Права на объект не проверяются: чтение доступно всем
+            row = generics.get_object_or_404(
+                get_recipe_rows(self.filter_queryset(self.get_queryset())),
+                pk=self.kwargs['pk'])
+            return Response(serialize_recipe_rows([row], request)[0])
+        return super().retrieve(request)
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeGetSerializer
@@ -153,10 +274,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return delete_model_instance(request, Favorite,
                                      recipe, error_message)
 
-    @action(detail=False, methods=['get'],
+    def bulk_change(self, request, model):
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            results = bulk_add_recipes(request.user, model, recipe_ids)
+        else:
+            results = bulk_remove_recipes(request.user, model, recipe_ids)
+        return Response({'results': results})
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='bulk/shopping_cart',
+            permission_classes=[IsAuthenticated])
+    def bulk_shopping_cart(self, request):
+        """Добавление и удаление списка рецептов в корзине."""
+        return self.bulk_change(request, ShoppingCart)
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='bulk/favorite',
             permission_classes=[IsAuthenticated])
+    def bulk_favorite(self, request):
+        """Добавление и удаление списка рецептов в избранном."""
+        return self.bulk_change(request, Favorite)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS,
+            content_negotiation_class=ShoppingListNegotiation)
     def download_shopping_cart(self, request):
-        """Выгрузка списка покупок."""
+        """Выгрузка списка покупок в формате ?format=txt|csv|pdf."""
         user = request.user
         user_sc = user.shopping_cart.all()
         if not user_sc.exists():
@@ -164,30 +313,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'В вашей корзине пока ничего нет',
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ingredients = Ingredient.objects.filter(
-            recipes__shopping_cart__user=user).values(
-            'name',
-            'measurement_unit'
-        ).annotate(amount=Sum('ingredients__amount'))
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient["name"]
-            unit = ingredient["measurement_unit"]
-            amount = ingredient["amount"]
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-            shopping_list_print = download_shopping_list(shopping_list)
-        return shopping_list_print
-
-
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+        ingredients = user.shopping_list.values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).order_by('name')
+        return download_shopping_list(
+            ingredients, request.accepted_renderer.format)
+
+
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тэгов."""
 
     permission_classes = AllowAny,
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
+    def list(self, request, *args, **kwargs):
+        return tags_payload.response(request)
+
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
 
     permission_classes = AllowAny,
@@ -196,6 +342,16 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not request.query_params:
+            return ingredients_payload.response(request)
+        if name and settings.INGREDIENT_INDEX_ENABLED:
+            serializer = self.get_serializer(
+                ingredient_index.search(name), many=True)
+            return Response(serializer.data)
+        return super().list(request, *args, **kwargs)
+
 
 class OpenAPISchemaView(TemplateView):
     template_name = 'openapi-schema.yml'
@@ -1,5 +1,6 @@
 # flake8: noqa
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +87,45 @@ else:
         }
     }
 
+# Реплики только для чтения через запятую: в DEBUG - файлы SQLite
+# (копии db.sqlite3), иначе хосты PostgreSQL вида host[:port]
+# с той же базой и учётной записью, что и основная
+DB_REPLICAS = [
+    replica.strip() for replica in os.getenv('DB_REPLICAS', '').split(',')
+    if replica.strip()
+]
+for number, replica in enumerate(DB_REPLICAS, 1):
+    replica_database = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DEBUG:
+        replica_database['NAME'] = BASE_DIR / replica
+    else:
+        host, _, port = replica.partition(':')
+        replica_database.update(HOST=host, PORT=port or replica_database['PORT'])
+    DATABASES[f'replica_{number}'] = replica_database
+if DB_REPLICAS:
+    DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# Сколько секунд юзер после записи читает с основной базы; метка
+# хранится в кэше, поэтому воркерам gunicorn нужен общий кэш
+DB_PRIMARY_PIN_SECONDS = int(os.getenv('DB_PRIMARY_PIN_SECONDS', 15))
+
+# Для нескольких воркеров gunicorn нужен общий кэш, например
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+# Кэш представлений рецептов
+RECIPE_CACHE_ENABLED = os.getenv('RECIPE_CACHE_ENABLED', '').lower() == 'true'
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60 * 24))
+# Сборка списков и страниц рецептов из .values() без RecipeGetSerializer,
+# проверка совпадения: manage.py compare_serializers
+RECIPE_FAST_SERIALIZATION = os.getenv(
+    'RECIPE_FAST_SERIALIZATION', '').lower() == 'true'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -129,6 +170,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
+# JWT включается параметром JWT_AUTH_ENABLED, токены Token продолжают работать
+JWT_AUTH_ENABLED = os.getenv('JWT_AUTH_ENABLED', '').lower() == 'true'
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', 30))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -139,6 +184,53 @@ REST_FRAMEWORK = {
     ],
 }
 
+if JWT_AUTH_ENABLED:
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].insert(
+        0, 'api.authentication.CachedJWTAuthentication')
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 7))),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    # Ротации refresh-токенов нет, приложение token_blacklist
+    # не подключено: иначе /auth/jwt/verify/ падает на его модели
+    'BLACKLIST_AFTER_ROTATION': False,
+}
+
+# Индекс ингредиентов в памяти для автодополнения по ?name=
+INGREDIENT_INDEX_ENABLED = os.getenv('INGREDIENT_INDEX_ENABLED', '').lower() == 'true'
+INGREDIENT_INDEX_LIMIT = int(os.getenv('INGREDIENT_INDEX_LIMIT', 50))
+INGREDIENT_INDEX_STAMP = BASE_DIR / '.ingredient_index'
+
+# Метка версии тегов и ингредиентов для ETag и кэша рецептов
+CATALOG_VERSION_STAMP = BASE_DIR / '.catalog_version'
+# Метка версии рецептов для ETag списков
+RECIPES_VERSION_STAMP = BASE_DIR / '.recipes_version'
+
+# Шрифт с кириллицей для выгрузки списка покупок в PDF
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# Процессов для нарезки вариантов фото рецептов, 0 - в потоке запроса
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
+
+# Метрики запросов по маршрутам в формате Prometheus на /metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '').lower() == 'true'
+# Каталог файлов метрик, общий для воркеров gunicorn; пустой - только
+# метрики текущего процесса. Очищается при запуске gunicorn, файлы
+# завершившихся воркеров сводятся в один (gunicorn.conf.py)
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+# Запросы к базе дольше порога пишутся в лог, мс; 0 - не писать
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+
+# Поиск N+1 в сериализаторах для разработки и тестов:
+# log - писать в лог, raise - ошибка NPlusOneError
+NPLUSONE_DETECTION = os.getenv('NPLUSONE_DETECTION', '').lower()
+# Сколько одинаковых запросов с разными параметрами считать N+1
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 2))
+
 
 DJOSER = {
     'HIDE_USERS': False,
@@ -0,0 +1,16 @@
+"""Настройки gunicorn, файл читается из рабочего каталога."""
+import os
+
+from api.metrics import archive_worker, clear_metrics_dir
+
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+
+def on_starting(server):
+    if METRICS_DIR:
+        clear_metrics_dir(METRICS_DIR)
+
+
+def child_exit(server, worker):
+    if METRICS_DIR:
+        archive_worker(METRICS_DIR, worker.pid)
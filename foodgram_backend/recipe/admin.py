@@ -1,66 +1,105 @@
 from django.contrib import admin
 
 from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                           ShoppingCart, Tag, TagRecipe)
+                           ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from recipe.paginators import EstimatedCountPaginator
 
 
-class FavoriteAdmin(admin.ModelAdmin):
-    ...
+class LargeTableAdmin(admin.ModelAdmin):
+    """Админка для больших таблиц без полного COUNT(*) на каждой странице."""
 
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-class ShoppingCartAdmin(admin.ModelAdmin):
-    ...
+
+class FavoriteAdmin(LargeTableAdmin):
+    list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+
+class ShoppingCartAdmin(LargeTableAdmin):
+    list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+
+class ShoppingListItemAdmin(LargeTableAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
+    autocomplete_fields = ('user', 'ingredient')
 
 
 class TagAdmin(admin.ModelAdmin):
-    ...
+    search_fields = ('name', 'slug')
 
 
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = (
         "name",
         "measurement_unit"
     )
     list_filter = (
-        "name",
+        "measurement_unit",
     )
+    search_fields = ('name',)
 
 
 class TagRecipeInline(admin.TabularInline):
     model = TagRecipe
     min_num = 1
+    autocomplete_fields = ('tag',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe__author', 'tag')
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe__author', 'ingredient')
 
-class RecipeAdmin(admin.ModelAdmin):
+
+class RecipeAdmin(LargeTableAdmin):
     inlines = [
         TagRecipeInline,
         RecipeIngredientInline,
     ]
     list_display = ('id', 'name', 'author', 'text',
                     'cooking_time', 'pub_date', 'image',
-                    'display_ingredients')
-    list_filter = ('name', 'author', 'tags__name')
+                    'display_ingredients', 'favorite_count')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('ingredients')
 
     def display_ingredients(self, obj):
         return ", ".join([ingredient.name for ingredient
                           in obj.ingredients.all()])
 
-    @admin.display(description='В избранном')
+    @admin.display(description='В избранном', ordering='favorites_count')
     def favorite_count(self, recipe):
-        return recipe.favorites_recipe.count()
+        return recipe.favorites_count
 
 
-class TagRecipeAdmin(admin.ModelAdmin):
-    ...
+class TagRecipeAdmin(LargeTableAdmin):
+    list_display = ('recipe', 'tag')
+    list_select_related = ('recipe__author', 'tag')
+    autocomplete_fields = ('recipe', 'tag')
 
 
-class RecipeIngredientAdmin(admin.ModelAdmin):
-    ...
+class RecipeIngredientAdmin(LargeTableAdmin):
+    list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe__author', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
 admin.site.register(Tag, TagAdmin)
@@ -70,3 +109,4 @@ admin.site.register(TagRecipe, TagRecipeAdmin)
 admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
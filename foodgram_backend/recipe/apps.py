@@ -5,3 +5,6 @@ class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
     verbose_name = 'Админзона Рецептов'
+
+    def ready(self):
+        import recipe.signals  # noqa: F401
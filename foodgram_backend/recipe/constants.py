@@ -14,3 +14,8 @@ MAX_LENGTH_LAST_NAME = 150
 MAX_LENGTH_PASSWORD = 150
 MAX_LENGTH_COLORFIELD = 7
 PAGINATION_PAGE_SIZE = 6
+INGREDIENT_SEARCH_LIMIT = 50  # Максимум подсказок при поиске ингредиента
+SHOPPING_LIST_CHUNK_SIZE = 2000  # Строк за одно чтение курсора
+SHOPPING_LIST_PDF_SPOOL_SIZE = 1024 * 1024  # PDF в памяти, байт
+ADMIN_ESTIMATED_COUNT_MIN = 100000  # С какого размера таблицы считать оценку
+BULK_RECIPES_LIMIT = 100  # Рецептов в одном пакетном запросе
@@ -0,0 +1,59 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipe.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscriptions, User
+
+# (модель со счётчиком, поле счётчика, считаемая модель, поле связи)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscriptions, 'author'),
+)
+
+
+def update_counters(sender, instance, delta):
+    """Изменение счётчиков, связанных с записью sender, на delta.
+
+    Обновление идёт выражением F() в одном UPDATE, поэтому
+    параллельные запросы не теряют изменения друг друга.
+    """
+    for model, field, related, link in COUNTERS:
+        if related is sender:
+            model.objects.filter(pk=getattr(instance, f'{link}_id')).update(
+                **{field: Greatest(F(field) + delta, Value(0))})
+
+
+def update_recipe_counters(sender, recipe_ids, delta):
+    """Изменение счётчиков сразу нескольких рецептов одним UPDATE."""
+    for model, field, related, link in COUNTERS:
+        if related is sender and model is Recipe:
+            Recipe.objects.filter(pk__in=recipe_ids).update(
+                **{field: Greatest(F(field) + delta, Value(0))})
+
+
+def count_subquery(related, link):
+    return Coalesce(Subquery(
+        related.objects.filter(**{link: OuterRef('pk')}).order_by()
+        .values(link).annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+def reconcile_counters(check=False):
+    """Сверка счётчиков с фактическим числом записей.
+
+    Возвращает число расхождений по каждому счётчику, без check
+    расходящиеся счётчики исправляются.
+    """
+    mismatches = {}
+    for model, field, related, link in COUNTERS:
+        drifted = model.objects.annotate(
+            actual=count_subquery(related, link)
+        ).exclude(**{field: F('actual')})
+        mismatches[f'{model.__name__}.{field}'] = drifted.count()
+        if not check:
+            model.objects.filter(
+                pk__in=drifted.values('pk')
+            ).update(**{field: count_subquery(related, link)})
+    return mismatches
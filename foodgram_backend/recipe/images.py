@@ -0,0 +1,141 @@
+import logging
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipe.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipes/renditions'
+# Название: (размер, обрезать под размер)
+RENDITIONS = {
+    'thumbnail': ((150, 150), True),
+    'card': ((480, 360), True),
+    'full': ((1280, 1280), False),
+}
+RENDITION_FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+}
+RENDITION_QUALITY = 85
+RENDITION_ERROR = 'Не удалось обработать изображение %s'
+
+# Варианты фото готовы: обновление в обход post_save
+renditions_ready = Signal()
+
+_executor = None
+
+
+def renditions_dir(image_name):
+    """Папка вариантов изображения относительно MEDIA_ROOT."""
+    return f'{RENDITIONS_DIR}/{PurePosixPath(image_name).stem}'
+
+
+def rendition_name(image_name, rendition, image_format):
+    """Путь варианта изображения относительно MEDIA_ROOT."""
+    extension = RENDITION_FORMATS[image_format][1]
+    return f'{renditions_dir(image_name)}/{rendition}.{extension}'
+
+
+def rendition_names(image_name):
+    return {
+        rendition: {
+            image_format: rendition_name(image_name, rendition, image_format)
+            for image_format in RENDITION_FORMATS
+        }
+        for rendition in RENDITIONS
+    }
+
+
+def build_renditions(source_path, media_root, image_name):
+    """Нарезка вариантов изображения, выполняется в отдельном процессе."""
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    for rendition, (size, crop) in RENDITIONS.items():
+        if crop:
+            resized = ImageOps.fit(image, size, Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+        for image_format, (pil_format, _) in RENDITION_FORMATS.items():
+            path = Path(media_root) / rendition_name(
+                image_name, rendition, image_format)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            resized.save(path, pil_format, quality=RENDITION_QUALITY)
+    return image_name
+
+
+def delete_renditions(image_name):
+    """Удаление вариантов изображения, которое больше не используется."""
+    shutil.rmtree(
+        Path(settings.MEDIA_ROOT) / renditions_dir(image_name),
+        ignore_errors=True)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_RENDITION_WORKERS)
+    return _executor
+
+
+def mark_ready(recipe_id, image_name):
+    """Отметка готовности вариантов фото.
+
+    Если изображение рецепта за время нарезки заменили или рецепт
+    удалили, нарезанные варианты никому не нужны и удаляются.
+    """
+    if Recipe.objects.filter(id=recipe_id, image=image_name).update(
+            has_renditions=True, modified=timezone.now()):
+        renditions_ready.send(sender=Recipe, recipe_id=recipe_id)
+        return
+    image = Recipe.objects.filter(id=recipe_id).values_list(
+        'image', flat=True).first()
+    if not image or renditions_dir(image) != renditions_dir(image_name):
+        delete_renditions(image_name)
+
+
+def _on_done(recipe_id, image_name, thread_id, future):
+    try:
+        future.result()
+        mark_ready(recipe_id, image_name)
+    except Exception:
+        logger.exception(RENDITION_ERROR, image_name)
+    finally:
+        # Колбэк выполняется в служебном потоке пула, если задача
+        # не успела завершиться до его добавления.
+        if threading.get_ident() != thread_id:
+            connection.close()
+
+
+def schedule_renditions(recipe_id, image_name, executor=None):
+    """Постановка нарезки в пул процессов.
+
+    При IMAGE_RENDITION_WORKERS = 0 нарезка выполняется сразу, ошибка
+    только записывается в лог, как и в пуле: рецепт уже сохранён,
+    варианты фото остаются неготовыми.
+    """
+    args = (default_storage.path(image_name), settings.MEDIA_ROOT,
+            image_name)
+    if executor is None and not settings.IMAGE_RENDITION_WORKERS:
+        try:
+            build_renditions(*args)
+            mark_ready(recipe_id, image_name)
+        except Exception:
+            logger.exception(RENDITION_ERROR, image_name)
+        return None
+    future = (executor or get_executor()).submit(build_renditions, *args)
+    future.add_done_callback(
+        partial(_on_done, recipe_id, image_name, threading.get_ident()))
+    return future
@@ -0,0 +1,92 @@
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, transaction
+
+from recipe.constants import INGREDIENT_SEARCH_LIMIT
+from recipe.models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированный список названий в нижнем регистре и отвечает
+    на поиск по началу названия бинарным поиском, без обращения к базе.
+    Сброс индекса отмечается временем изменения файла-метки, поэтому
+    изменения из админки или команд импорта видят все воркеры.
+    Индекс строится по основной базе: отставшая реплика оставила бы
+    его устаревшим до следующего сброса.
+    """
+
+    def __init__(self, stamp_path):
+        self.stamp_path = Path(stamp_path)
+        self._lock = threading.Lock()
+        self._entries = ([], [])
+        self._built_at = None
+
+    def _stamp(self):
+        try:
+            return self.stamp_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def build(self):
+        """Построение индекса по таблице Ingredient."""
+        with self._lock:
+            stamp = self._stamp()
+            ingredients = sorted(
+                (
+                    Ingredient(id=pk, name=name, measurement_unit=unit)
+                    for pk, name, unit in Ingredient.objects.using(
+                        DEFAULT_DB_ALIAS).values_list(
+                            'id', 'name', 'measurement_unit')
+                ),
+                key=lambda obj: (obj.name.casefold(), obj.name, obj.id)
+            )
+            self._entries = (
+                [obj.name.casefold() for obj in ingredients], ingredients)
+            self._built_at = stamp
+
+    def warm_up(self):
+        """Построение индекса при старте воркера, если база доступна."""
+        try:
+            self.build()
+        except DatabaseError:
+            self._built_at = None
+
+    def invalidate(self):
+        """Сброс индекса во всех процессах после фиксации транзакции.
+
+        Иначе воркер, перестроивший индекс до фиксации, хранил бы его
+        без изменения до следующего сброса.
+        """
+        transaction.on_commit(self._reset)
+
+    def _reset(self):
+        self._built_at = None
+        self.stamp_path.touch()
+
+    def search(self, prefix, limit=None):
+        """Ингредиенты, название которых начинается с prefix."""
+        if self._built_at is None or self._built_at != self._stamp():
+            self.build()
+        if limit is None:
+            limit = getattr(
+                settings, 'INGREDIENT_INDEX_LIMIT', INGREDIENT_SEARCH_LIMIT)
+        prefix = prefix.casefold()
+        keys, ingredients = self._entries
+        result = []
+        position = bisect_left(keys, prefix)
+        while (position < len(keys) and len(result) < limit
+               and keys[position].startswith(prefix)):
+            result.append(ingredients[position])
+            position += 1
+        return result
+
+
+ingredient_index = IngredientIndex(
+    getattr(settings, 'INGREDIENT_INDEX_STAMP',
+            settings.BASE_DIR / '.ingredient_index')
+)
@@ -0,0 +1,141 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import get_recipe_rows, serialize_recipe_rows
+from api.serializers import RecipeGetSerializer
+from api.views import RecipeViewSet
+from recipe.models import Favorite, Recipe
+from users.models import User
+
+# Длина фрагмента JSON в отчёте о расхождении
+DIFF_CONTEXT = 80
+
+
+def get_request(user):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    return request
+
+
+def get_queryset(request, fast, ids):
+    """Queryset вьюсета рецептов для выбранного способа сериализации."""
+    view = RecipeViewSet(request=request, action='list', format_kwarg=None)
+    with override_settings(RECIPE_CACHE_ENABLED=False,
+                           RECIPE_FAST_SERIALIZATION=fast):
+        queryset = view.get_queryset()
+    return queryset.filter(id__in=ids).order_by('-pub_date', '-id')
+
+
+def serialize(request, ids):
+    return RecipeGetSerializer(
+        get_queryset(request, False, ids), many=True,
+        context={'request': request}).data
+
+
+def fast_serialize(request, ids):
+    return serialize_recipe_rows(
+        get_recipe_rows(get_queryset(request, True, ids)), request)
+
+
+def first_difference(expected, actual):
+    index = next(
+        (index for index, (a, b) in enumerate(zip(expected, actual))
+         if a != b),
+        min(len(expected), len(actual))
+    )
+    start = max(index - DIFF_CONTEXT // 2, 0)
+    return (expected[start:start + DIFF_CONTEXT].decode(errors='replace'),
+            actual[start:start + DIFF_CONTEXT].decode(errors='replace'))
+
+
+class Command(BaseCommand):
+    """Сравнение быстрой сериализации рецептов с RecipeGetSerializer"""
+    help = ('Check that fast recipe serialization renders byte-identical '
+            'JSON and measure the per-recipe cost of both paths')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Количество последних рецептов для сравнения',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Повторов замера, берётся лучший',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id юзера для флагов, по умолчанию - юзер с избранным',
+        )
+
+    def handle(self, *args, **options):
+        ids = list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+            'id', flat=True)[:options['limit']])
+        if not ids:
+            raise CommandError('Нет рецептов: сначала заполните базу')
+        user = self.get_user(options['user'])
+        renderer = JSONRenderer()
+        mismatches = 0
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for request in (get_request(AnonymousUser()), get_request(user)):
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'Юзер: {request.user}, рецептов: {len(ids)}'))
+                mismatches += self.compare(request, ids, renderer)
+                for name, function in (('RecipeGetSerializer', serialize),
+                                       ('fast_serializers', fast_serialize)):
+                    self.benchmark(name, function, request, ids, renderer,
+                                   options['repeat'])
+        if mismatches:
+            raise CommandError(f'Расхождений: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('JSON совпадает побайтно'))
+
+    def get_user(self, user_id):
+        if user_id is not None:
+            user = User.objects.filter(id=user_id).first()
+            if user is None:
+                raise CommandError(f'Юзер {user_id} не найден')
+            return user
+        favorite = Favorite.objects.select_related('user').first()
+        if favorite is not None:
+            return favorite.user
+        return Recipe.objects.select_related('author').first().author
+
+    def compare(self, request, ids, renderer):
+        expected = [renderer.render(item) for item in serialize(request, ids)]
+        actual = [renderer.render(item)
+                  for item in fast_serialize(request, ids)]
+        if len(expected) != len(actual):
+            self.stdout.write(self.style.ERROR(
+                f'  рецептов: {len(expected)} и {len(actual)}'))
+            return 1
+        mismatches = 0
+        for recipe_id, a, b in zip(ids, expected, actual):
+            if a != b:
+                mismatches += 1
+                a, b = first_difference(a, b)
+                self.stdout.write(self.style.ERROR(
+                    f'  рецепт {recipe_id}:\n    {a}\n    {b}'))
+        return mismatches
+
+    def benchmark(self, name, function, request, ids, renderer, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                renderer.render(function(request, ids))
+                timings.append(time.perf_counter() - start)
+        per_item = min(timings) / len(ids) * 1e6
+        self.stdout.write(
+            f'  {name}: {per_item:.1f} мкс на рецепт, '
+            f'запросов: {len(context.captured_queries)}')
@@ -0,0 +1,121 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipe.models import Favorite, Ingredient, Recipe, Tag
+
+# (название, адрес, таблицы с ожидаемым полным просмотром) - адрес
+# форматируется данными из базы. Списки рецептов без фильтров читают
+# всю таблицу для COUNT пагинации.
+ENDPOINTS = (
+    ('recipes', '/api/recipes/', {'recipe_recipe'}),
+    ('recipes keyset', '/api/recipes/?cursor=', {'recipe_recipe'}),
+    ('recipes by author', '/api/recipes/?author={author}', set()),
+    ('recipes by tag', '/api/recipes/?tags={tag}', set()),
+    ('favorited recipes', '/api/recipes/?is_favorited=1', set()),
+    ('recipes in cart', '/api/recipes/?is_in_shopping_cart=1', set()),
+    ('recipes search', '/api/recipes/?search={word}', set()),
+    ('recipe', '/api/recipes/{recipe}/', set()),
+    ('users', '/api/users/', {'users_user'}),
+    ('subscriptions', '/api/users/subscriptions/', set()),
+    ('ingredients by name', '/api/ingredients/?name={ingredient}', set()),
+    ('shopping cart', '/api/recipes/download_shopping_cart/?format=txt',
+     set()),
+)
+# Таблицы, полный просмотр которых не считается проблемой
+SMALL_TABLES = {'recipe_tag'}
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING| VIRTUAL TABLE)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+class Command(BaseCommand):
+    """Планы запросов основных эндпоинтов API"""
+    help = 'EXPLAIN every query of the main API endpoints on current data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            dest='strict',
+            default=False,
+            help='Ошибка, если есть полный просмотр больших таблиц',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            dest='analyze',
+            default=False,
+            help='EXPLAIN ANALYZE на PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SCAN_PATTERNS:
+            raise CommandError(f'База {connection.vendor} не поддерживается')
+        recipe = Recipe.objects.select_related('author').first()
+        if recipe is None:
+            raise CommandError('Нет рецептов: сначала заполните базу')
+        favorite = Favorite.objects.select_related('user').first()
+        user = favorite.user if favorite else recipe.author
+        params = {
+            'author': recipe.author_id,
+            'tag': Tag.objects.values_list('slug', flat=True).first(),
+            'recipe': recipe.id,
+            'word': recipe.name.split()[0],
+            'ingredient': (Ingredient.objects.values_list(
+                'name', flat=True).first() or '')[:2],
+        }
+        client = APIClient()
+        client.force_authenticate(user)
+        scans = []
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for name, url, expected in ENDPOINTS:
+                scans += [
+                    (name, table) for table in self.explain_endpoint(
+                        client, name, url.format(**params),
+                        options['analyze'])
+                    if table not in expected | SMALL_TABLES
+                ]
+        if scans:
+            self.stdout.write(self.style.WARNING(
+                'Полный просмотр таблиц: ' + ', '.join(
+                    f'{name} ({table})' for name, table in scans)))
+            if options['strict']:
+                raise CommandError(f'Полных просмотров: {len(scans)}')
+        else:
+            self.stdout.write(self.style.SUCCESS('Полных просмотров нет'))
+
+    def explain_endpoint(self, client, name, url, analyze):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{name}: GET {url} -> {response.status_code}, '
+            f'запросов: {len(context.captured_queries)}'))
+        tables = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            self.stdout.write(f'  {sql[:200]}')
+            for line in self.explain(sql, analyze):
+                self.stdout.write(f'    {line}')
+                tables += SCAN_PATTERNS[connection.vendor].findall(line)
+        return [table for table in tables if table != 'subquery']
+
+    def explain(self, sql, analyze):
+        if connection.vendor == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        else:
+            prefix = 'EXPLAIN ANALYZE ' if analyze else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            return [row[-1] for row in rows]
+        return [row[0] for row in rows]
@@ -0,0 +1,209 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipe.constants import (MAX_LENGTH_MEASUREMENT_INGREDIENT,
+                              MAX_LENGTH_NAME_INGREDIENT)
+from recipe.models import Ingredient
+from recipe.signals import ingredients_loaded
+
+FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_ndjson(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            item = json.loads(line)
+            yield item['name'], item['measurement_unit']
+
+
+def read_json(file):
+    """Потоковое чтение JSON-массива объектов по частям файла."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов')
+    position = 1
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Некорректный JSON')
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+def clean_rows(rows, skipped):
+    for name, unit in rows:
+        name, unit = str(name).strip(), str(unit).strip()
+        if (not name or not unit
+                or len(name) > MAX_LENGTH_NAME_INGREDIENT
+                or len(unit) > MAX_LENGTH_MEASUREMENT_INGREDIENT):
+            skipped.append(name)
+            continue
+        yield name, unit
+
+
+class CopyFile:
+    """Файл для COPY, отдающий строки CSV из итератора."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = ''
+        self.writer = csv.writer(self)
+
+    def write(self, value):
+        self.buffer += value
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow(row)
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class Command(BaseCommand):
+    """Загрузка справочника ингредиентов из CSV, JSON или NDJSON"""
+    help = 'Stream-load ingredients, skipping existing (name, unit) pairs'
+
+    default_path = 'data/ingredients.json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=None,
+            help='Путь к файлу, по умолчанию data/ingredients.json',
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            default=None,
+            help='Формат файла, по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Строк в одной пачке bulk_create',
+        )
+        parser.add_argument(
+            '--delete-existing',
+            action='store_true',
+            dest='delete_existing',
+            default=False,
+            help='Удалить все ингредиенты (и их связи с рецептами)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or os.path.join(
+            settings.BASE_DIR, self.default_path)
+        file_format = options['format'] or FORMATS.get(
+            os.path.splitext(path)[1].lower())
+        if file_format not in READERS:
+            raise CommandError(f'Не удалось определить формат файла {path}')
+        skipped = []
+        started = time.monotonic()
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = clean_rows(READERS[file_format](file), skipped)
+            with transaction.atomic():
+                if options['delete_existing']:
+                    Ingredient.objects.all().delete()
+                if connection.vendor == 'postgresql':
+                    read, created = self.load_copy(rows)
+                else:
+                    read, created = self.load_bulk(
+                        rows, options['batch_size'])
+        elapsed = max(time.monotonic() - started, 1e-6)
+        ingredients_loaded.send(sender=Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {read}, добавлено: {created}, '
+            f'пропущено: {len(skipped)}, '
+            f'{read / elapsed:.0f} строк/с за {elapsed:.2f} с'
+        ))
+
+    def load_bulk(self, rows, batch_size):
+        """Пачки bulk_create с пропуском уже существующих пар."""
+        before = Ingredient.objects.count()
+        read = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            read += len(batch)
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch],
+                ignore_conflicts=True
+            )
+        return read, Ingredient.objects.count() - before
+
+    def load_copy(self, rows):
+        """COPY во временную таблицу и вставка новых пар одним запросом."""
+        table = Ingredient._meta.db_table
+        counter = {'read': 0}
+
+        def counted(rows):
+            for row in rows:
+                counter['read'] += 1
+                yield row
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_staging '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.cursor.copy_expert(
+                'COPY ingredient_staging (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                CopyFile(counted(rows))
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_staging '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            created = cursor.rowcount
+        return counter['read'], created
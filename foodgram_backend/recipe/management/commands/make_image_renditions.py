@@ -0,0 +1,57 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipe.images import build_renditions, mark_ready
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    """Нарезка вариантов фото для уже загруженных рецептов"""
+    help = 'Backfill thumbnail, card and full renditions of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='all',
+            default=False,
+            help='Пересоздать варианты и для уже обработанных рецептов',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Количество процессов',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(has_renditions=False)
+        workers = options['workers'] or settings.IMAGE_RENDITION_WORKERS or 1
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    build_renditions,
+                    image.path, settings.MEDIA_ROOT, image.name
+                ): (recipe_id, image.name)
+                for recipe_id, image in (
+                    (recipe.id, recipe.image)
+                    for recipe in recipes.only('id', 'image').iterator()
+                )
+            }
+            for future in as_completed(futures):
+                recipe_id, image_name = futures[future]
+                try:
+                    future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{image_name}: {error}')
+                    continue
+                mark_ready(recipe_id, image_name)
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано фото: {done}, с ошибками: {failed}'))
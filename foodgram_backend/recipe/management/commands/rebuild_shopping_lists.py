@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    """Перестроение и проверка сводных списков покупок"""
+    help = 'Rebuild and verify per-user shopping list aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            dest='check',
+            default=False,
+            help='Только проверить расхождения, не перестраивая',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            ShoppingListItem.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS('Списки покупок перестроены'))
+        expected = {
+            (user_id, ingredient): amount
+            for user_id, ingredient, amount
+            in ShoppingListItem.objects.expected().iterator()
+        }
+        actual = {
+            (user_id, ingredient): amount
+            for user_id, ingredient, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount').iterator()
+        }
+        mismatches = [
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        ]
+        for user_id, ingredient in mismatches[:20]:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient}: '
+                f'ожидается {expected.get((user_id, ingredient))}, '
+                f'в таблице {actual.get((user_id, ingredient))}'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет'))
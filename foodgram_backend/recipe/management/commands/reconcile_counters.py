@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    """Сверка и исправление счётчиков рецептов и юзеров"""
+    help = 'Reconcile denormalized recipe and user counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            dest='check',
+            default=False,
+            help='Только проверить расхождения, не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_counters(check=options['check'])
+        for counter, count in mismatches.items():
+            if count:
+                self.stdout.write(f'{counter}: расхождений {count}')
+        total = sum(mismatches.values())
+        if options['check'] and total:
+            raise CommandError(f'Расхождений: {total}')
+        if total:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено счётчиков: {total}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
@@ -0,0 +1,387 @@
+import os
+import random
+import time
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from math import gcd
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from PIL import Image
+
+from api.catalog import bump_catalog_version
+from api.conditional import bump_recipes_version
+from recipe.constants import MAX_AMOUNT
+from recipe.counters import reconcile_counters
+from recipe.images import build_renditions
+from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                           ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from recipe.search import rebuild_index
+from users.models import Subscriptions, User
+
+# Начало периода публикации рецептов, от сида не зависит
+SEED_START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+PLACEHOLDER_DIR = 'recipes/images/seed'
+PLACEHOLDER_SIZE = (640, 480)
+CHUNK_SIZE = 10000  # Записей в одной задаче воркера
+
+# Показатели степенного распределения: чем больше, тем сильнее перекос
+AUTHOR_SKEW = 1.1
+RECIPE_SKEW = 1.05
+ACTIVITY_SKEW = 0.8
+INGREDIENT_SKEW = 1.0
+TAG_SKEW = 0.7
+
+TAGS = (
+    ('Завтрак', 'breakfast', '#E26C2D'),
+    ('Обед', 'lunch', '#49B64E'),
+    ('Ужин', 'dinner', '#8775D2'),
+    ('Десерт', 'dessert', '#F2C94C'),
+    ('Выпечка', 'bakery', '#B5651D'),
+    ('Салат', 'salad', '#27AE60'),
+    ('Суп', 'soup', '#EB5757'),
+    ('Напитки', 'drinks', '#2D9CDB'),
+)
+FIRST_NAMES = (
+    'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Ирина', 'Светлана',
+    'Александр', 'Дмитрий', 'Сергей', 'Андрей', 'Алексей', 'Иван', 'Михаил',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров',
+    'Соколов', 'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков',
+)
+ADJECTIVES = (
+    'Домашний', 'Быстрый', 'Летний', 'Зимний', 'Пряный', 'Нежный',
+    'Бабушкин', 'Праздничный', 'Лёгкий', 'Сытный', 'Острый', 'Постный',
+)
+DISHES = (
+    'борщ', 'плов', 'пирог', 'салат', 'суп', 'омлет', 'рагу', 'гуляш',
+    'пудинг', 'кекс', 'соус', 'смузи', 'гратен', 'ризотто', 'жаркое',
+)
+SENTENCES = (
+    'Нарежьте овощи небольшими кубиками.',
+    'Разогрейте сковороду с маслом на среднем огне.',
+    'Смешайте все ингредиенты в глубокой миске.',
+    'Готовьте под крышкой, периодически помешивая.',
+    'Посолите и поперчите по вкусу.',
+    'Выпекайте в разогретой до 180 градусов духовке.',
+    'Дайте блюду настояться несколько минут.',
+    'Подавайте горячим, украсив зеленью.',
+    'Взбейте яйца с сахаром до пышной массы.',
+    'Доведите до кипения и уменьшите огонь.',
+)
+
+
+class ZipfSampler:
+    """Выбор номера из range(n) по степенному распределению.
+
+    Популярные номера не совпадают с первыми id: ранг переводится
+    в номер умножением на взаимно простой с n шаг.
+    """
+
+    def __init__(self, n, skew):
+        self.n = n
+        self.cum_weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, n + 1)))
+        self.total = self.cum_weights[-1]
+        self.step = next(
+            step for step in range(int(n * 0.618) or 1, 2 * n + 2)
+            if gcd(step, n) == 1
+        )
+
+    def __call__(self, rng):
+        rank = min(bisect(self.cum_weights, rng.random() * self.total),
+                   self.n - 1)
+        return rank * self.step % self.n
+
+
+_samplers = {}
+
+
+def get_sampler(n, skew):
+    """Сэмплер с кешем на процесс, веса считаются один раз."""
+    if (n, skew) not in _samplers:
+        _samplers[n, skew] = ZipfSampler(n, skew)
+    return _samplers[n, skew]
+
+
+def chunk_random(plan, kind, start):
+    """Генератор задачи зависит только от сида, вида и начала задачи,
+    поэтому данные не зависят от числа воркеров."""
+    return random.Random(f'{plan["seed"]}:{kind}:{start}')
+
+
+@contextmanager
+def explicit_dates(model, *names):
+    """Отключение auto_now, чтобы bulk_create записал заданные даты."""
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed_users(plan, start, stop):
+    rng = chunk_random(plan, 'users', start)
+    users = []
+    for number in range(start, stop):
+        pk = plan['user_base'] + number + 1
+        users.append(User(
+            id=pk,
+            username=f'seed_user_{pk}',
+            email=f'seed_user_{pk}@example.com',
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            password=plan['password'],
+            date_joined=SEED_START + timedelta(
+                days=plan['days'] * number / plan['users']),
+        ))
+    User.objects.bulk_create(users, batch_size=plan['batch_size'])
+    return len(users)
+
+
+def seed_recipes(plan, start, stop):
+    """Рецепты с ингредиентами и тегами одной задачей."""
+    rng = chunk_random(plan, 'recipes', start)
+    authors = get_sampler(plan['users'], AUTHOR_SKEW)
+    ingredient_sampler = get_sampler(
+        len(plan['ingredients']), INGREDIENT_SKEW)
+    tag_sampler = get_sampler(len(plan['tags']), TAG_SKEW)
+    recipes, ingredients, tags = [], [], []
+    for number in range(start, stop):
+        pk = plan['recipe_base'] + number + 1
+        pub_date = SEED_START + timedelta(
+            days=plan['days'] * number / plan['recipes'],
+            seconds=rng.randrange(3600))
+        recipes.append(Recipe(
+            id=pk,
+            author_id=plan['user_base'] + authors(rng) + 1,
+            name=(f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} '
+                  f'№{pk}'),
+            text=' '.join(rng.sample(SENTENCES, rng.randint(2, 5))),
+            image=rng.choice(plan['images']),
+            has_renditions=True,
+            cooking_time=max(1, min(600, int(rng.lognormvariate(3.4, 0.6)))),
+            pub_date=pub_date,
+            modified=pub_date,
+        ))
+        chosen = {
+            ingredient_sampler(rng)
+            for _ in range(int(rng.triangular(2, 15, 6)))
+        }
+        ingredients.extend(
+            RecipeIngredient(
+                recipe_id=pk,
+                ingredient_id=plan['ingredients'][index],
+                amount=min(MAX_AMOUNT, int(rng.lognormvariate(4.5, 1)) + 1),
+            )
+            for index in sorted(chosen)
+        )
+        tags.extend(
+            TagRecipe(recipe_id=pk, tag_id=plan['tags'][index])
+            for index in sorted(
+                {tag_sampler(rng) for _ in range(rng.randint(1, 3))})
+        )
+    with explicit_dates(Recipe, 'pub_date', 'modified'):
+        with transaction.atomic():
+            Recipe.objects.bulk_create(
+                recipes, batch_size=plan['batch_size'])
+            RecipeIngredient.objects.bulk_create(
+                ingredients, batch_size=plan['batch_size'])
+            TagRecipe.objects.bulk_create(
+                tags, batch_size=plan['batch_size'])
+    return len(recipes)
+
+
+def seed_relations(plan, kind, start, stop):
+    """Избранное, корзины или подписки: кто выбирается по активности,
+    что - по популярности рецепта или автора."""
+    rng = chunk_random(plan, kind, start)
+    users = get_sampler(plan['users'], ACTIVITY_SKEW)
+    if kind == 'subscriptions':
+        model, target_field = Subscriptions, 'author_id'
+        targets = get_sampler(plan['users'], AUTHOR_SKEW)
+        target_base = plan['user_base']
+    else:
+        model = Favorite if kind == 'favorites' else ShoppingCart
+        target_field = 'recipe_id'
+        targets = get_sampler(plan['recipes'], RECIPE_SKEW)
+        target_base = plan['recipe_base']
+    pairs = set()
+    for _ in range(start, stop):
+        user_id = plan['user_base'] + users(rng) + 1
+        target_id = target_base + targets(rng) + 1
+        if kind == 'subscriptions' and user_id == target_id:
+            continue
+        pairs.add((user_id, target_id))
+    model.objects.bulk_create(
+        [model(user_id=user_id, **{target_field: target_id})
+         for user_id, target_id in sorted(pairs)],
+        batch_size=plan['batch_size'],
+        ignore_conflicts=True
+    )
+    return len(pairs)
+
+
+def run_task(task, *args):
+    return task(*args)
+
+
+class Command(BaseCommand):
+    """Генерация большого набора данных для проверки производительности"""
+    help = ('Generate a deterministic production-scale dataset of users, '
+            'recipes, favorites, carts and subscriptions')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000,
+                            help='Количество юзеров')
+        parser.add_argument('--recipes', type=int, default=1000000,
+                            help='Количество рецептов')
+        parser.add_argument('--favorites', type=int, default=3000000,
+                            help='Попыток добавить рецепт в избранное')
+        parser.add_argument('--carts', type=int, default=500000,
+                            help='Попыток добавить рецепт в корзину')
+        parser.add_argument('--subscriptions', type=int, default=500000,
+                            help='Попыток подписаться на автора')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Сид генератора')
+        parser.add_argument('--days', type=int, default=730,
+                            help='За сколько дней распределить публикации')
+        parser.add_argument('--images', type=int, default=20,
+                            help='Количество фото-заглушек')
+        parser.add_argument('--password', default='seed-password',
+                            help='Пароль всех созданных юзеров')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Количество процессов, по умолчанию по '
+                                 'числу ядер; для SQLite всегда 1')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Строк в одной пачке bulk_create')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Нужен хотя бы один юзер и один рецепт')
+        started = time.monotonic()
+        workers = options['workers'] or os.cpu_count() or 1
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write('SQLite не поддерживает параллельную запись, '
+                              'используется один процесс')
+            workers = 1
+        plan = self.make_plan(options)
+        self.stdout.write(
+            f'Юзеры с id > {plan["user_base"]}, '
+            f'рецепты с id > {plan["recipe_base"]}, процессов: {workers}')
+        self.run_phase('Юзеры', workers, [
+            (seed_users, plan, start, stop)
+            for start, stop in self.chunks(options['users'])
+        ])
+        self.run_phase('Рецепты', workers, [
+            (seed_recipes, plan, start, stop)
+            for start, stop in self.chunks(options['recipes'])
+        ])
+        self.run_phase('Избранное, корзины, подписки', workers, [
+            (seed_relations, plan, kind, start, stop)
+            for kind in ('favorites', 'carts', 'subscriptions')
+            for start, stop in self.chunks(options[kind])
+        ])
+        self.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с'))
+
+    def make_plan(self, options):
+        """Параметры, которые получает каждая задача воркера."""
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=self.stdout)
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, slug=slug, color=color)
+                for name, slug, color in TAGS)
+            bump_catalog_version()
+        return {
+            'seed': options['seed'],
+            'users': options['users'],
+            'recipes': options['recipes'],
+            'days': options['days'],
+            'batch_size': options['batch_size'],
+            'user_base': User.objects.aggregate(max_id=Max('id'))['max_id']
+            or 0,
+            'recipe_base': Recipe.objects.aggregate(
+                max_id=Max('id'))['max_id'] or 0,
+            'ingredients': list(Ingredient.objects.order_by(
+                'id').values_list('id', flat=True)),
+            'tags': list(Tag.objects.order_by('id').values_list(
+                'id', flat=True)),
+            'images': self.make_placeholders(options['images'], options[
+                'seed']),
+            'password': make_password(
+                options['password'], salt=f'seed{options["seed"]}'),
+        }
+
+    def make_placeholders(self, count, seed):
+        """Одноцветные фото-заглушки с готовыми вариантами.
+
+        Рецепты ссылаются на общие файлы, поэтому декодировать
+        и нарезать изображения для каждого рецепта не нужно.
+        """
+        rng = random.Random(seed)
+        names = []
+        for number in range(max(count, 1)):
+            name = f'{PLACEHOLDER_DIR}/placeholder_{number}.jpg'
+            path = Path(settings.MEDIA_ROOT) / name
+            color = tuple(rng.randrange(256) for _ in range(3))
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                Image.new('RGB', PLACEHOLDER_SIZE, color).save(path, 'JPEG')
+                build_renditions(path, settings.MEDIA_ROOT, name)
+            names.append(name)
+        return names
+
+    def chunks(self, total):
+        return [
+            (start, min(start + CHUNK_SIZE, total))
+            for start in range(0, total, CHUNK_SIZE)
+        ]
+
+    def run_phase(self, title, workers, tasks):
+        """Выполнение задач этапа; следующий этап ждёт завершения."""
+        started = time.monotonic()
+        if workers == 1:
+            created = sum(run_task(*task) for task in tasks)
+        else:
+            # Дочерние процессы открывают свои соединения с базой
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                created = sum(
+                    future.result() for future in
+                    [executor.submit(run_task, *task) for task in tasks])
+        self.stdout.write(
+            f'{title}: {created} за {time.monotonic() - started:.1f} с')
+
+    def finish(self):
+        """Пересчёт того, что bulk_create обходит вместе с сигналами."""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [User, Recipe]):
+                    cursor.execute(sql)
+        started = time.monotonic()
+        mismatches = reconcile_counters()
+        ShoppingListItem.objects.rebuild()
+        rebuild_index()
+        bump_recipes_version()
+        self.stdout.write(
+            f'Счётчики ({sum(mismatches.values())}), списки покупок и '
+            f'поисковый индекс пересчитаны за '
+            f'{time.monotonic() - started:.1f} с')
@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-17 00:01
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    User = apps.get_model('users', 'User')
+    counters = (
+        (Recipe, 'favorites_count', apps.get_model('recipe', 'Favorite'),
+         'recipe'),
+        (Recipe, 'in_carts_count', apps.get_model('recipe', 'ShoppingCart'),
+         'recipe'),
+        (User, 'recipes_count', Recipe, 'author'),
+        (User, 'subscribers_count', apps.get_model('users', 'Subscriptions'),
+         'author'),
+    )
+    for model, field, related, link in counters:
+        model.objects.update(**{field: Coalesce(
+            models.Subquery(
+                related.objects.filter(**{link: models.OuterRef('pk')})
+                .order_by().values(link)
+                .annotate(total=models.Count('pk')).values('total')
+            ), models.Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_recipe_modified'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from users.trigram import trigram_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_counters'),
+        # Расширение pg_trgm
+        ('users', '0003_admin_search_indexes'),
+    ]
+
+    operations = [
+        trigram_indexes({
+            'recipe_recipe_name_trgm': ('recipe_recipe', 'name'),
+            'recipe_ingredient_name_trgm': ('recipe_ingredient', 'name'),
+        }),
+    ]
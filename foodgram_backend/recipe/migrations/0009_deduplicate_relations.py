@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-17 00:06
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def delete_duplicates(model, fields):
+    """Удаление повторов, из каждой группы остаётся запись с меньшим id."""
+    keep = model.objects.values(*fields).annotate(
+        keep=models.Min('id')).order_by().values('keep')
+    deleted, _ = model.objects.exclude(id__in=keep).delete()
+    return deleted
+
+
+def deduplicate(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Favorite = apps.get_model('recipe', 'Favorite')
+    ShoppingCart = apps.get_model('recipe', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('recipe', 'ShoppingListItem')
+    TagRecipe = apps.get_model('recipe', 'TagRecipe')
+    delete_duplicates(TagRecipe, ('tag', 'recipe'))
+    for model, field in ((Favorite, 'favorites_count'),
+                         (ShoppingCart, 'in_carts_count')):
+        if delete_duplicates(model, ('user', 'recipe')):
+            Recipe.objects.update(**{field: Coalesce(models.Subquery(
+                model.objects.filter(recipe=models.OuterRef('pk'))
+                .order_by().values('recipe')
+                .annotate(total=models.Count('pk')).values('total')
+            ), models.Value(0))})
+            if model is ShoppingCart:
+                ShoppingListItem.objects.all().delete()
+                totals = ShoppingCart.objects.filter(
+                    recipe__recipe_set__isnull=False
+                ).values(
+                    'user',
+                    ingredient=models.F('recipe__recipe_set__ingredient')
+                ).annotate(total=models.Sum('recipe__recipe_set__amount'))
+                ShoppingListItem.objects.bulk_create(
+                    ShoppingListItem(user_id=row['user'],
+                                     ingredient_id=row['ingredient'],
+                                     amount=row['total'])
+                    for row in totals.order_by().iterator()
+                )
+
+
+# Отдельная миграция: на PostgreSQL удаление строк и ALTER TABLE
+# той же таблицы нельзя выполнять в одной транзакции
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate, migrations.RunPython.noop),
+    ]
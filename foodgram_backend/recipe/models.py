@@ -1,6 +1,7 @@
 from colorfield.fields import ColorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, Value, When
 
 from recipe.constants import (MAX_AMOUNT, MAX_COOKING_TIME,
                               MAX_LENGTH_COLORFIELD,
@@ -8,8 +9,8 @@ from recipe.constants import (MAX_AMOUNT, MAX_COOKING_TIME,
                               MAX_LENGTH_NAME_INGREDIENT,
                               MAX_LENGTH_NAME_RECIPE, MAX_LENGTH_NAME_TAG,
                               MAX_LENGTH_SLUG_TAG, MIN_AMOUNT,
-                              MIN_COOKING_TIME)
-from users.models import User
+                              MIN_COOKING_TIME, SHOPPING_LIST_CHUNK_SIZE)
+from users.models import CountersMixin, User
 
 
 class Tag(models.Model):
@@ -79,9 +80,11 @@ class Ingredient(models.Model):
         return f'Ингредиент {self.name}'
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """Модель Рецептов."""
 
+    counter_fields = ('favorites_count', 'in_carts_count')
+
     author = models.ForeignKey(
         User,
         verbose_name='Автор рецепта',
@@ -128,6 +131,25 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата добавления рецепта'
     )
+    modified = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения рецепта'
+    )
+    has_renditions = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Варианты фото готовы'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах'
+    )
 
     class Meta:
         verbose_name = 'Рецепт',
@@ -139,6 +161,16 @@ class Recipe(models.Model):
                 name='unique_name_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Названиие рецепта: {self.name}, автор: {self.author}'
@@ -188,6 +220,7 @@ class TagRecipe(models.Model):
     tag = models.ForeignKey(
         Tag,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Тег'
     )
 
@@ -195,6 +228,12 @@ class TagRecipe(models.Model):
         verbose_name = 'Рецепт-Тег',
         verbose_name_plural = 'Рецепты-Теги'
         ordering = ('recipe',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'recipe'],
+                name='unique_tag_recipe'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} {self.tag}'
@@ -206,6 +245,7 @@ class Favorite(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Пользователь',
         related_name='favorites'
     )
@@ -220,6 +260,12 @@ class Favorite(models.Model):
         verbose_name = 'Рецепт в избранном',
         verbose_name_plural = 'Рецепты в избранном'
         ordering = ('recipe',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_favorite'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe}, {self.user}'
@@ -231,6 +277,7 @@ class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='shopping_cart',
         verbose_name='Юзер'
     )
@@ -245,6 +292,139 @@ class ShoppingCart(models.Model):
         verbose_name = 'Корзина покупок',
         verbose_name_plural = 'Корзины покупок'
         ordering = ('recipe',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe}, {self.user}'
+
+
+class ShoppingListItemManager(models.Manager):
+    """Обновление сводного списка покупок."""
+
+    def apply_delta(self, user_ids, deltas):
+        """Изменение количества ингредиентов у юзеров.
+
+        deltas - словарь {id ингредиента: изменение количества}.
+        Строки с нулевым количеством удаляются.
+        """
+        deltas = {
+            ingredient: delta for ingredient, delta in deltas.items() if delta
+        }
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        with transaction.atomic():
+            self.bulk_create(
+                [
+                    self.model(user_id=user_id, ingredient_id=ingredient,
+                               amount=0)
+                    for user_id in user_ids for ingredient in deltas
+                ],
+                ignore_conflicts=True
+            )
+            items = self.filter(user_id__in=user_ids,
+                                ingredient_id__in=deltas)
+            items.update(amount=F('amount') + Case(
+                *[When(ingredient_id=ingredient, then=Value(delta))
+                  for ingredient, delta in deltas.items()],
+                default=Value(0)
+            ))
+            items.filter(amount__lte=0).delete()
+
+    def apply_recipe(self, user_ids, recipe, sign=1):
+        """Добавление (sign=1) или удаление (sign=-1) рецепта."""
+        self.apply_recipes(user_ids, [recipe], sign)
+
+    def apply_recipes(self, user_ids, recipes, sign=1):
+        """Добавление или удаление нескольких рецептов одним пересчётом."""
+        if not recipes:
+            return
+        self.apply_delta(user_ids, {
+            ingredient: sign * total
+            for ingredient, total in RecipeIngredient.objects.filter(
+                recipe__in=recipes).values('ingredient_id').annotate(
+                    total=Sum('amount')).values_list(
+                        'ingredient_id', 'total').order_by()
+        })
+
+    def apply_recipe_change(self, recipe, old_amounts, new_amounts):
+        """Пересчёт у всех, чья корзина содержит изменённый рецепт."""
+        deltas = {
+            ingredient: (new_amounts.get(ingredient, 0)
+                         - old_amounts.get(ingredient, 0))
+            for ingredient in old_amounts.keys() | new_amounts.keys()
+        }
+        if not any(deltas.values()):
+            return
+        self.apply_delta(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True).order_by(),
+            deltas
+        )
+
+    def expected(self):
+        """Сводный список, посчитанный по корзинам заново."""
+        return ShoppingCart.objects.filter(
+            recipe__recipe_set__isnull=False
+        ).values(
+            'user', ingredient=F('recipe__recipe_set__ingredient')
+        ).annotate(
+            total=Sum('recipe__recipe_set__amount')
+        ).values_list('user', 'ingredient', 'total').order_by()
+
+    @transaction.atomic
+    def rebuild(self):
+        """Полное перестроение сводного списка."""
+        self.all().delete()
+        self.bulk_create(
+            (
+                self.model(user_id=user_id, ingredient_id=ingredient,
+                           amount=amount)
+                for user_id, ingredient, amount in self.expected().iterator()
+            ),
+            batch_size=SHOPPING_LIST_CHUNK_SIZE
+        )
+
+
+class ShoppingListItem(models.Model):
+    """Сводный список покупок юзера.
+
+    Сумма количества каждого ингредиента по рецептам в корзине,
+    обновляется при изменении корзины и состава рецептов.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Юзер'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество'
+    )
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}, {self.ingredient}, {self.amount}'
@@ -0,0 +1,30 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from recipe.constants import ADMIN_ESTIMATED_COUNT_MIN
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки с оценкой числа строк большой таблицы.
+
+    Для списка без фильтров на PostgreSQL число строк берётся
+    из статистики pg_class вместо COUNT(*) по всей таблице.
+    Небольшие таблицы и отфильтрованные списки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = %s::regclass',
+                    [query.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ADMIN_ESTIMATED_COUNT_MIN:
+                return row[0]
+        return super().count
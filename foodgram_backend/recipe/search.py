@@ -0,0 +1,104 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from recipe.models import Recipe
+
+# Конфигурация PostgreSQL со стеммингом под LANGUAGE_CODE = 'ru-ru'
+SEARCH_CONFIG = 'russian'
+# Таблица FTS5 для SQLite, rowid совпадает с id рецепта
+FTS_TABLE = 'recipe_recipe_fts'
+# Вес названия относительно описания в bm25
+FTS_NAME_WEIGHT = 10.0
+
+
+def get_vendor(using):
+    return connections[using].vendor
+
+
+def to_fts_query(query):
+    """Запрос FTS5 из слов поиска: все слова по началу, через AND.
+
+    Стемминга для русского в FTS5 нет, поиск по префиксу
+    находит словоформы с общим началом.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, по убыванию релевантности.
+
+    На PostgreSQL используется столбец search_vector с GIN-индексом,
+    на SQLite - таблица FTS5, на других базах - icontains.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(Recipe._meta.db_table)
+    if connection.vendor == 'postgresql':
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        params = [SEARCH_CONFIG, query]
+        matches = RawSQL(
+            f'SELECT id FROM {table} WHERE search_vector @@ {tsquery}',
+            params)
+        rank = RawSQL(
+            f'ts_rank({table}.search_vector, {tsquery})', params,
+            output_field=FloatField())
+    elif connection.vendor == 'sqlite':
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return queryset.none()
+        matches = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [fts_query])
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {FTS_NAME_WEIGHT}, 1.0) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = {table}.id',
+            [fts_query], output_field=FloatField())
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query))
+    return queryset.filter(id__in=matches).annotate(
+        search_rank=rank).order_by('-search_rank', *Recipe._meta.ordering)
+
+
+def index_recipe(recipe, using):
+    """Обновление строки рецепта в FTS5.
+
+    На PostgreSQL search_vector - генерируемый столбец,
+    его обновляет сама база.
+    """
+    if get_vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            'VALUES (%s, %s, %s)',
+            [recipe.pk, recipe.name, recipe.text])
+
+
+def unindex_recipe(recipe_id, using):
+    if get_vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id])
+
+
+def rebuild_index(using='default'):
+    """Полное перестроение FTS5, например после bulk_create рецептов."""
+    if get_vendor(using) != 'sqlite':
+        return
+    table = Recipe._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            f'SELECT id, name, text FROM {table}')
@@ -0,0 +1,118 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import Signal, receiver
+
+from recipe.counters import update_counters
+from recipe.images import (delete_renditions, renditions_dir,
+                           schedule_renditions)
+from recipe.ingredient_index import ingredient_index
+from recipe.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                           ShoppingListItem)
+from recipe.search import index_recipe, unindex_recipe
+from users.models import Subscriptions
+
+# Массовая загрузка ингредиентов в обход post_save
+ingredients_loaded = Signal()
+
+
+@receiver(ingredients_loaded)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    """Сброс индекса ингредиентов при их изменении."""
+    if settings.INGREDIENT_INDEX_ENABLED:
+        ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """Добавление ингредиентов рецепта в сводный список покупок."""
+    if created:
+        ShoppingListItem.objects.apply_recipe(
+            [instance.user_id], instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """Вычитание ингредиентов рецепта из сводного списка покупок.
+
+    pre_delete, потому что при каскадном удалении рецепта его
+    ингредиенты к post_delete уже удалены.
+    """
+    ShoppingListItem.objects.apply_recipe(
+        [instance.user_id], instance.recipe_id, sign=-1)
+
+
+@receiver(pre_save, sender=Recipe)
+def reset_renditions(instance, **kwargs):
+    """Сброс готовности вариантов фото при замене изображения.
+
+    Варианты старого изображения удаляются после фиксации транзакции.
+    """
+    instance._image_changed = True
+    if instance.pk is None:
+        return
+    old_image = Recipe.objects.filter(pk=instance.pk).values_list(
+        'image', flat=True).first()
+    instance._image_changed = old_image != instance.image.name
+    if not instance._image_changed:
+        return
+    instance.has_renditions = False
+    if old_image and (not instance.image
+                      or renditions_dir(old_image)
+                      != renditions_dir(instance.image.name)):
+        transaction.on_commit(partial(delete_renditions, old_image))
+
+
+@receiver(post_save, sender=Recipe)
+def make_renditions(instance, **kwargs):
+    """Нарезка вариантов фото после сохранения рецепта.
+
+    Только при новом изображении, иначе каждое сохранение рецепта
+    с неготовыми вариантами ставило бы ещё одну задачу.
+    """
+    if (instance.has_renditions or not instance.image
+            or not getattr(instance, '_image_changed', True)):
+        return
+    transaction.on_commit(
+        lambda: schedule_renditions(instance.pk, instance.image.name))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_renditions(instance, **kwargs):
+    """Удаление вариантов фото удалённого рецепта."""
+    if instance.image:
+        transaction.on_commit(
+            partial(delete_renditions, instance.image.name))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscriptions)
+def increment_counters(sender, instance, created, **kwargs):
+    """Увеличение счётчиков избранного, корзин, рецептов и подписчиков."""
+    if created:
+        update_counters(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscriptions)
+def decrement_counters(sender, instance, **kwargs):
+    update_counters(sender, instance, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(instance, using, **kwargs):
+    """Обновление полнотекстового индекса SQLite при сохранении рецепта."""
+    index_recipe(instance, using)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(instance, using, **kwargs):
+    unindex_recipe(instance.pk, using)
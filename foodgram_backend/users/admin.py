@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from recipe.paginators import EstimatedCountPaginator
 from users.models import User
 
 
@@ -10,12 +11,17 @@ class WorkUserAdmin(UserAdmin):
         "username",
         "first_name",
         "last_name",
-        "email"
+        "email",
+        "recipes_count",
+        "subscribers_count"
     )
     list_filter = (
-        "email",
-        "username"
+        "is_staff",
+        "is_active"
     )
+    search_fields = ('username', 'email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(User, WorkUserAdmin)
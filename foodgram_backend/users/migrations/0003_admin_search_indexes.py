@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from users.trigram import TrigramExtension, trigram_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        # Общее для всех приложений расширение, только на PostgreSQL
+        TrigramExtension(),
+        trigram_indexes({
+            'users_user_username_trgm': ('users_user', 'username'),
+            'users_user_email_trgm': ('users_user', 'email'),
+        }),
+    ]
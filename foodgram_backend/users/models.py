@@ -8,7 +8,27 @@ from recipe.constants import (MAX_LENGTH_EMAIL, MAX_LENGTH_FIRST_NAME,
                               MAX_LENGTH_USERNAME)
 
 
-class User(AbstractUser):
+class CountersMixin:
+    """Защита счётчиков от затирания при полном сохранении модели.
+
+    Счётчики меняются только выражениями F(), поэтому save() без
+    update_fields не записывает их устаревшие значения из памяти.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersMixin, AbstractUser):
     """Модель юзеров."""
 
     USERNAME_FIELD = 'email'
@@ -17,6 +37,7 @@ class User(AbstractUser):
         'first_name',
         'last_name',
     ]
+    counter_fields = ('recipes_count', 'subscribers_count')
     email = models.EmailField(
         max_length=MAX_LENGTH_EMAIL,
         unique=True
@@ -40,6 +61,16 @@ class User(AbstractUser):
     password = models.CharField(
         max_length=MAX_LENGTH_PASSWORD
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков'
+    )
 
     class Meta:
         ordering = ('username',)
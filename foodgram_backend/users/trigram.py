@@ -0,0 +1,43 @@
+from django.contrib.postgres import operations
+from django.db import migrations
+
+
+class TrigramExtension(operations.TrigramExtension):
+    """Расширение pg_trgm, на других базах ничего не делает.
+
+    В Django 3.2 откат CreateExtension не проверяет базу и на SQLite
+    падает на запросе к pg_extension.
+    """
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        super().database_backwards(
+            app_label, schema_editor, from_state, to_state)
+
+
+def trigram_indexes(indexes):
+    """Операция миграции с триграммными индексами под поиск админки.
+
+    indexes - {имя индекса: (таблица, колонка)}, индекс строится по
+    UPPER(колонка), как в запросах icontains. Расширение pg_trgm
+    создаёт миграция users 0003. На других базах ничего не делает.
+    """
+
+    def create_indexes(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name, (table, column) in indexes.items():
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+                f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+            )
+
+    def drop_indexes(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for name in indexes:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+    return migrations.RunPython(create_indexes, drop_indexes)
@@ -0,0 +1,391 @@
+"""Нагрузочный прогон сценариев postman-коллекции.
+
+Каждый виртуальный пользователь в своём потоке проходит запросы
+коллекции по порядку со своим набором переменных: адреса почты и имена
+пользователей уникальны для запуска, пользователя и итерации, а id и
+токены берутся из ответов так же, как в тестах коллекции. По итогам
+выводится задержка p50/p95/p99, пропускная способность и доля ошибок
+по каждому эндпоинту; результаты сохраняются в JSON для сравнения
+двух запусков.
+
+Пример:
+    python load_test.py --users 20 --iterations 5 --output after.json \\
+        --compare before.json
+"""
+import argparse
+import http.client
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+DEFAULT_COLLECTION = Path(__file__).with_name(
+    'diploma.postman_collection.json')
+# Переменные, значения которых должны быть уникальны в каждом прогоне
+UNIQUE_EMAILS = ('email', 'secondUserEmail', 'thirdUserEmail')
+UNIQUE_USERNAMES = ('username', 'secondUserUsername', 'thirdUserUsername')
+PERCENTILES = (50, 95, 99)
+
+VARIABLE = re.compile(r'{{(\w+)}}')
+EXPECTED_STATUS = re.compile(r'\.to\.be\.eql\(\s*["\']([^"\']+)["\']\s*\)')
+LOCAL_GET = re.compile(
+    r'const (\w+) = _\.get\(responseData, ["\']([\w.\[\]]+)["\']\)')
+SET_VARIABLE = re.compile(
+    r'pm\.collectionVariables\.set\(\s*["\'](\w+)["\']\s*,\s*(.+?)\s*\);?$')
+RESPONSE_PATH = re.compile(
+    r'^responseData((?:\[\d+\]|\.\w+)*)'
+    r'(?:\.slice\((\d+),\s*(\d+)\))?$')
+PATH_PART = re.compile(r'\[(\d+)\]|\.?(\w+)')
+STATUS_CODES = {status.phrase: status.value for status in HTTPStatus}
+
+
+def get_path(data, path):
+    """Значение по пути вида [0].name или id, None при отсутствии."""
+    for index, key in PATH_PART.findall(path):
+        try:
+            data = data[int(index)] if index else data[key]
+        except (IndexError, KeyError, TypeError, ValueError):
+            return None
+    return data
+
+
+def parse_extractors(lines):
+    """Правила сохранения переменных из тестового скрипта запроса."""
+    local = {}
+    extractors = []
+    for line in lines:
+        line = line.strip()
+        match = LOCAL_GET.search(line)
+        if match:
+            local[match[1]] = match[2]
+            continue
+        match = SET_VARIABLE.search(line)
+        if not match:
+            continue
+        name, expression = match.groups()
+        if expression in local:
+            extractors.append((name, local[expression], None))
+            continue
+        match = RESPONSE_PATH.match(expression)
+        if match:
+            path, start, end = match.groups()
+            extractors.append((
+                name, path,
+                (int(start), int(end)) if start is not None else None
+            ))
+    return extractors
+
+
+def parse_step(item, auth):
+    request = item['request']
+    script = [
+        line
+        for event in item.get('event', ())
+        if event['listen'] == 'test'
+        for line in event['script']['exec']
+    ]
+    expected = EXPECTED_STATUS.search('\n'.join(script))
+    url = request['url']
+    headers = {
+        header['key']: header['value']
+        for header in request.get('header', ())
+        if not header.get('disabled')
+    }
+    body = request.get('body', {})
+    if body.get('options', {}).get('raw', {}).get('language') == 'json':
+        headers.setdefault('Content-Type', 'application/json')
+    auth = request.get('auth') or auth
+    if auth and auth['type'] == 'apikey':
+        options = {option['key']: option['value'] for option in auth['apikey']}
+        headers[options['key']] = options['value']
+    path = VARIABLE.sub(r'{\1}', '/' + '/'.join(url.get('path', ())))
+    return {
+        'name': item['name'],
+        'method': request['method'],
+        'url': url['raw'],
+        'endpoint': f"{request['method']} {path}",
+        'headers': headers,
+        'body': body.get('raw') if body.get('mode') == 'raw' else None,
+        'expected': STATUS_CODES.get(expected[1]) if expected else None,
+        'extractors': parse_extractors(script),
+    }
+
+
+def load_collection(path, folders=None):
+    """Плоский список запросов коллекции с учётом наследования auth."""
+    collection = json.loads(Path(path).read_text(encoding='utf-8'))
+    steps = []
+
+    def walk(items, auth, selected):
+        for item in items:
+            item_auth = item.get('auth') or auth
+            if 'item' in item:
+                walk(item['item'], item_auth,
+                     selected or not folders or item['name'] in folders)
+            elif selected or not folders:
+                steps.append(parse_step(item, item_auth))
+
+    walk(collection['item'], collection.get('auth'), False)
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    return steps, variables
+
+
+def unique_variables(variables, suffix):
+    """Уникальные адреса почты и имена пользователей для прогона."""
+    variables = dict(variables)
+    for key in UNIQUE_EMAILS:
+        local, domain = json.loads(variables[key]).split('@')
+        variables[key] = json.dumps(f'{local}-{suffix}@{domain}')
+    for key in UNIQUE_USERNAMES:
+        variables[key] = json.dumps(f'{json.loads(variables[key])}-{suffix}')
+    return variables
+
+
+def substitute(value, variables):
+    return VARIABLE.sub(
+        lambda match: str(variables.get(match[1], match[0])), value)
+
+
+class VirtualUser(threading.Thread):
+    """Поток, который проходит сценарий коллекции заданное число раз."""
+
+    def __init__(self, number, options, steps, variables, samples):
+        super().__init__(daemon=True)
+        self.number = number
+        self.options = options
+        self.steps = steps
+        self.variables = variables
+        self.samples = samples
+        self.connection = None
+
+    def connect(self):
+        url = urlsplit(self.options.base_url)
+        connection_class = (http.client.HTTPSConnection
+                            if url.scheme == 'https'
+                            else http.client.HTTPConnection)
+        self.connection = connection_class(
+            url.netloc, timeout=self.options.timeout)
+
+    def send(self, method, url, body, headers):
+        """Запрос по keep-alive соединению с одной попыткой переподключения."""
+        for attempt in range(2):
+            if self.connection is None:
+                self.connect()
+            try:
+                self.connection.request(method, url, body, headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def run_step(self, step, variables):
+        url = urlsplit(substitute(step['url'], variables))
+        target = quote(url.path, safe='/%')
+        if url.query:
+            target += '?' + quote(url.query, safe='=&%+')
+        headers = {
+            key: substitute(value, variables)
+            for key, value in step['headers'].items()
+        }
+        body = step['body']
+        if body is not None:
+            body = substitute(body, variables).encode('utf-8')
+        started = time.perf_counter()
+        try:
+            status, content = self.send(
+                step['method'], target, body, headers)
+        except (http.client.HTTPException, OSError) as error:
+            self.samples.append((step['endpoint'],
+                                 time.perf_counter() - started,
+                                 None, type(error).__name__))
+            return
+        elapsed = time.perf_counter() - started
+        error = None
+        if step['expected'] and status != step['expected']:
+            error = f'expected {step["expected"]}, got {status}'
+        self.samples.append((step['endpoint'], elapsed, status, error))
+        if step['extractors'] and content:
+            try:
+                data = json.loads(content)
+            except ValueError:
+                return
+            for name, path, cut in step['extractors']:
+                value = get_path(data, path)
+                if value is None or value == '':
+                    continue
+                if cut:
+                    value = str(value)[cut[0]:cut[1]]
+                variables[name] = value
+
+    def run(self):
+        time.sleep(self.options.ramp_up * self.number
+                   / max(self.options.users, 1))
+        try:
+            for iteration in range(self.options.iterations):
+                variables = unique_variables(
+                    self.variables,
+                    f'{self.options.run_id}-{self.number}-{iteration}'
+                )
+                variables['baseUrl'] = ''
+                for step in self.steps:
+                    self.run_step(step, variables)
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+
+def percentile(values, rank):
+    """Перцентиль методом ближайшего ранга по отсортированному списку."""
+    if not values:
+        return None
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+def summarize(samples, elapsed):
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[sample[0]].append(sample)
+
+    def stats(group):
+        latencies = sorted(sample[1] * 1000 for sample in group)
+        errors = sum(1 for sample in group if sample[3])
+        result = {
+            'count': len(group),
+            'errors': errors,
+            'error_rate': round(errors / len(group), 4) if group else 0,
+            'throughput': round(len(group) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2)
+            if latencies else None,
+            'max_ms': round(latencies[-1], 2) if latencies else None,
+        }
+        for rank in PERCENTILES:
+            value = percentile(latencies, rank)
+            result[f'p{rank}_ms'] = round(value, 2) if value else value
+        statuses = defaultdict(int)
+        for sample in group:
+            statuses[str(sample[2] or sample[3])] += 1
+        result['statuses'] = dict(sorted(statuses.items()))
+        return result
+
+    endpoints = {name: stats(group) for name, group in sorted(groups.items())}
+    endpoints['TOTAL'] = stats(samples)
+    return endpoints
+
+
+def print_table(endpoints, file=None):
+    header = (f'{"endpoint":<52} {"count":>6} {"err%":>6} {"rps":>7} '
+              f'{"p50":>8} {"p95":>8} {"p99":>8}')
+    print(header, file=file)
+    print('-' * len(header), file=file)
+    for name, stats in endpoints.items():
+        print(f'{name[:52]:<52} {stats["count"]:>6} '
+              f'{stats["error_rate"] * 100:>6.1f} {stats["throughput"]:>7} '
+              f'{stats["p50_ms"] or 0:>8.1f} {stats["p95_ms"] or 0:>8.1f} '
+              f'{stats["p99_ms"] or 0:>8.1f}', file=file)
+
+
+def print_comparison(baseline, current):
+    """Изменение p95, пропускной способности и доли ошибок к базовому."""
+    print(f'\nСравнение с {baseline["meta"]["run_id"]} '
+          f'({baseline["meta"]["started"]})')
+    header = (f'{"endpoint":<52} {"p95 было":>9} {"p95 стало":>10} '
+              f'{"Δp95%":>7} {"Δrps%":>7} {"Δerr%":>7}')
+    print(header)
+    print('-' * len(header))
+    for name, stats in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if not before:
+            print(f'{name[:52]:<52} {"—":>9} {stats["p95_ms"] or 0:>10.1f}')
+            continue
+
+        def change(key):
+            if not before[key]:
+                return '—'
+            return f'{(stats[key] - before[key]) / before[key] * 100:+.1f}'
+
+        print(f'{name[:52]:<52} {before["p95_ms"] or 0:>9.1f} '
+              f'{stats["p95_ms"] or 0:>10.1f} {change("p95_ms"):>7} '
+              f'{change("throughput"):>7} '
+              f'{(stats["error_rate"] - before["error_rate"]) * 100:>+7.1f}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный прогон сценариев postman-коллекции')
+    parser.add_argument('--collection', default=DEFAULT_COLLECTION,
+                        help='Путь к postman-коллекции')
+    parser.add_argument('--base-url', default=None,
+                        help='Адрес сервера, по умолчанию baseUrl коллекции')
+    parser.add_argument('--users', type=int, default=10,
+                        help='Число виртуальных пользователей')
+    parser.add_argument('--iterations', type=int, default=1,
+                        help='Прогонов сценария на пользователя')
+    parser.add_argument('--ramp-up', type=float, default=0,
+                        help='Секунд на постепенный старт пользователей')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='Таймаут запроса в секундах')
+    parser.add_argument('--folder', action='append', default=None,
+                        help='Выполнять только запросы из папки (повторяемый)')
+    parser.add_argument('--output', default='load_test_results.json',
+                        help='Файл для результатов в JSON')
+    parser.add_argument('--compare', default=None,
+                        help='Результаты прошлого запуска для сравнения')
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    steps, variables = load_collection(options.collection, options.folder)
+    options.base_url = (options.base_url or variables['baseUrl']).rstrip('/')
+    options.run_id = uuid.uuid4().hex[:8]
+    samples = []
+    users = [
+        VirtualUser(number, options, steps, variables, samples)
+        for number in range(options.users)
+    ]
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    started = time.perf_counter()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.perf_counter() - started
+    results = {
+        'meta': {
+            'run_id': options.run_id,
+            'started': started_at,
+            'base_url': options.base_url,
+            'users': options.users,
+            'iterations': options.iterations,
+            'ramp_up': options.ramp_up,
+            'steps': len(steps),
+            'elapsed_s': round(elapsed, 2),
+        },
+        'endpoints': summarize(samples, elapsed),
+    }
+    print_table(results['endpoints'])
+    Path(options.output).write_text(
+        json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'\nЗапросов: {len(samples)} за {elapsed:.2f} с, '
+          f'результаты сохранены в {options.output}')
+    if options.compare:
+        baseline = json.loads(
+            Path(options.compare).read_text(encoding='utf-8'))
+        print_comparison(baseline, results)
+
+
+if __name__ == '__main__':
+    main()